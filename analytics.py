@@ -0,0 +1,108 @@
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from badges import BadgeCatalog
+from models import Profile, ProfileChange
+
+
+class CohortAnalytics:
+    """
+    Per-badge cohort aggregates, kept up to date incrementally.
+
+    Tracks how many students have earned each catalog badge, how many completions
+    happened on each day, and who has finished every skill badge. A refresh only
+    subtracts the old record and adds the new one for each changed profile, so
+    the cost of an update does not depend on the size of the cohort.
+    """
+
+    def __init__(self, catalog: Optional[BadgeCatalog] = None):
+        """
+        :param catalog: The badge catalog profiles are matched against.
+        """
+        self.catalog = catalog
+        self.reset()
+
+    def reset(self) -> None:
+        self.students: int = 0
+        self.completions: Counter = Counter()  # badge ID -> students who earned it
+        self.daily: Dict[date, Counter] = {}  # earned date -> badge ID -> completions that day
+        self.completed_all: Dict[str, str] = {}  # profile ID -> name, for students with every skill badge
+
+    def rebuild(self, profiles: Iterable[Profile], catalog: Optional[BadgeCatalog] = None) -> None:
+        """Recomputes everything from scratch, e.g. on startup or when the catalog changes."""
+        if catalog is not None:
+            self.catalog = catalog
+        self.reset()
+        for profile in profiles:
+            self.add(profile)
+
+    def add(self, profile: Profile, sign: int = 1) -> None:
+        """Adds ``profile`` to the aggregates, or removes it again with ``sign=-1``."""
+        self.students += sign
+        if self.catalog is None:
+            return
+
+        for title, badge in profile.badges.items():
+            catalog_badge = self.catalog.lookup(title)
+            if catalog_badge is None:
+                continue
+            self.completions[catalog_badge.id] += sign
+            if badge.earned_on is not None:
+                day = self.daily.setdefault(badge.earned_on, Counter())
+                day[catalog_badge.id] += sign
+                if not day[catalog_badge.id]:
+                    del day[catalog_badge.id]
+                    if not day:
+                        del self.daily[badge.earned_on]
+
+        if self.catalog.has_completed(profile):
+            if sign > 0:
+                self.completed_all[profile.profile_id] = profile.profile_name
+            else:
+                self.completed_all.pop(profile.profile_id, None)
+
+    def apply(self, changes: Iterable[ProfileChange]) -> None:
+        """Applies the ProfileChange list returned by a sweep."""
+        for change in changes:
+            if change.old is not None:
+                self.add(change.old, -1)
+            if change.new is not None:
+                self.add(change.new)
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-badge completion counts and rates, and the students who completed every skill badge."""
+        badges = []
+        for badge in self.catalog.badges if self.catalog else []:
+            completed_by = self.completions.get(badge.id, 0)
+            badges.append({
+                "id": badge.id,
+                "title": badge.title,
+                "role": badge.role,
+                "completed_by": completed_by,
+                "completion_rate": round(completed_by / self.students, 4) if self.students else 0.0,
+            })
+        return {
+            "students": self.students,
+            "badges": badges,
+            "completed_all_skill_badges": [
+                {"profile_id": profile_id, "profile_name": name}
+                for profile_id, name in sorted(self.completed_all.items(), key=lambda item: (item[1], item[0]))
+            ],
+        }
+
+    def completions_per_day(self, since: Optional[date] = None, until: Optional[date] = None,
+                            badge_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the number of badge completions per day between ``since`` and ``until``
+        (inclusive), for one badge or for all catalog badges.
+        """
+        rows = []
+        for day in sorted(self.daily):
+            if (since and day < since) or (until and day > until):
+                continue
+            counts = self.daily[day]
+            count = counts.get(badge_id, 0) if badge_id is not None else sum(counts.values())
+            if count:
+                rows.append({"date": day.isoformat(), "completions": count})
+        return rows
@@ -0,0 +1,115 @@
+import json
+import re
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import Profile
+
+# Roles a catalog badge can have
+SKILL_BADGE = "skill"
+GAME_BADGE = "game"
+ROLES = (SKILL_BADGE, GAME_BADGE)
+
+# Arcade games show up as "Level N: ..." and are sometimes suffixed with "(Game)"
+GAME_TITLE_PATTERN = re.compile(r"^Level \d+:|\(Game\)\s*$")
+GAME_SUFFIX_PATTERN = re.compile(r"\s*\(Game\)\s*$")
+
+
+def normalize_title(title: str) -> str:
+    """
+    Key used to match profile badges against the catalog.
+
+    The roster CSV labels the arcade game "... (Game)" while the profile page does
+    not, so the suffix is dropped on both sides.
+    """
+    return GAME_SUFFIX_PATTERN.sub("", title.strip())
+
+
+def infer_role(title: str) -> str:
+    return GAME_BADGE if GAME_TITLE_PATTERN.search(title) else SKILL_BADGE
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogBadge:
+    """A badge tracked by the study jam."""
+    id: int
+    title: str
+    role: str
+    bit: int
+
+
+class BadgeCatalog:
+    """
+    The study jam's badges, loaded once from data/badges.json.
+
+    Every badge gets an integer ID, a role (skill badge or game) and a bit in a
+    completion mask, so matching a profile badge is a single dict lookup and a
+    profile's progress is a single integer.
+    """
+
+    def __init__(self, badges: Iterable[Tuple[int, str, str]]):
+        """
+        :param badges: (id, title, role) for each badge, in catalog order.
+        """
+        self.badges: List[CatalogBadge] = []
+        self.by_id: Dict[int, CatalogBadge] = {}
+        self.by_title: Dict[str, CatalogBadge] = {}
+        for bit_index, (badge_id, title, role) in enumerate(badges):
+            badge = CatalogBadge(badge_id, sys.intern(title), role, 1 << bit_index)
+            self.badges.append(badge)
+            self.by_id[badge_id] = badge
+            self.by_title[normalize_title(title)] = badge
+
+        self.skill_mask: int = sum(badge.bit for badge in self.badges if badge.role == SKILL_BADGE)
+        self.game_mask: int = sum(badge.bit for badge in self.badges if badge.role == GAME_BADGE)
+        self.skill_count: int = self.skill_mask.bit_count()
+
+    @classmethod
+    def load(cls, badges_file: str) -> "BadgeCatalog":
+        """
+        Reads the catalog from a badges JSON file as written by CSVProcessor.
+
+        A badge without an explicit "role" is treated as a game if its title looks
+        like an arcade level, and as a skill badge otherwise.
+        """
+        with open(badges_file, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        return cls(
+            (badge['id'], badge['title'], badge.get('role') or infer_role(badge['title']))
+            for badge in data['genai_badges']
+        )
+
+    def lookup(self, title: str) -> Optional[CatalogBadge]:
+        """Returns the catalog badge matching a profile badge title, if any."""
+        return self.by_title.get(normalize_title(title))
+
+    def apply(self, profile: Profile) -> Profile:
+        """
+        Fills in the GenAI summary of ``profile`` from its badges: the completion mask,
+        the skill badges earned (in page order), their count and whether a game is done.
+        """
+        mask = 0
+        skill_badges = []
+        for title in profile.badges:
+            badge = self.lookup(title)
+            if badge is None:
+                continue
+            mask |= badge.bit
+            if badge.role == SKILL_BADGE:
+                skill_badges.append(title)
+
+        profile.badge_mask = mask
+        profile.genai_badges = tuple(skill_badges)
+        profile.general.number_of_genai_skill_badges = len(skill_badges)
+        profile.general.games_done = int(bool(mask & self.game_mask))  # Will be 1 if true, otherwise 0
+        return profile
+
+    def has_completed(self, profile: Profile) -> bool:
+        """True if ``profile`` has every skill badge in the catalog."""
+        return bool(self.skill_mask) and profile.badge_mask & self.skill_mask == self.skill_mask
+
+    def missing(self, profiles: Iterable[Profile], badge_id: int) -> List[Profile]:
+        """Returns the ``profiles`` that have not earned badge ``badge_id``. Raises KeyError if it is unknown."""
+        bit = self.by_id[badge_id].bit
+        return [profile for profile in profiles if not profile.badge_mask & bit]
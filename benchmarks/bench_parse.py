@@ -0,0 +1,65 @@
+"""
+Compares the single-pass profile parser (producing a Profile record) against
+the original per-field regex scans on the saved HTML fixtures.
+
+    python -m benchmarks.bench_parse
+"""
+import html
+import re
+import timeit
+from typing import Dict, List
+
+from benchmarks.fixtures import FIXTURE_SIZES, load_fixture
+from scraper import parse_profile, parse_profile_record
+
+
+def legacy_compile_profile_info(html_content: str) -> Dict:
+    """The original Scraper.compile_profile_info: one uncompiled re.findall per field."""
+    def first(pattern: str, default: str) -> str:
+        match: List[str] = re.findall(pattern, html_content)
+        return match[0].strip() if match else default
+
+    badge_pattern = (
+        r"<div class='profile-badge'>\s*"
+        r"<a class=\"badge-image\" href=\"[^\"]*\">"
+        r"<img alt=\"Badge for ([^\"]*)\" src=\"([^\"]*)\"\s*[^>]*>\s*</a>"
+        r"<span class='ql-title-medium\s+l-mts'>\s*(.*?)\s*</span>"
+    )
+    date_pattern = r"<span class='ql-body-medium\s+l-mbs'>\s*(Earned [^\<]*)\s*</span>"
+    badge_dict = {}
+    for (badge_name, badge_image, _), earned in zip(re.findall(badge_pattern, html_content),
+                                                    re.findall(date_pattern, html_content)):
+        badge_dict[html.unescape(badge_name.strip())] = {
+            "badge_image": html.unescape(badge_image.strip()),
+            "earned_date": earned.strip()
+        }
+
+    return {
+        "profile_name": first(r"<title>([^|]+)\s*\|\s*Google Cloud Skills Boost</title>", "Unknown"),
+        "general": {
+            "league": first(r"<h2 class='ql-headline-medium'>(.*?)</h2>", "Unknown"),
+            "member_since": first(r"<p class='ql-body-large l-mbl'>\s*Member since (\d{4})\s*</p>", "Unknown"),
+            "earned_points": first(r"<strong>(\d+ points)</strong>", "0 points"),
+            "profile_image": first(
+                r"<ql-avatar class='profile-avatar l-mbl' size='\d+' src='([^']+)'></ql-avatar>", "No Image"),
+            "number_of_badges_earned": len(badge_dict)
+        },
+        "badges": badge_dict
+    }
+
+
+def bench(repeat: int = 5) -> None:
+    print(f"{'fixture':<22}{'bytes':>10}{'legacy µs':>12}{'single-pass µs':>16}{'speedup':>9}")
+    for name in FIXTURE_SIZES:
+        page = load_fixture(name)
+        if legacy_compile_profile_info(page) != parse_profile(page):
+            raise AssertionError(f"Parsers disagree on {name}")
+
+        number = max(1, 20000 // len(page) * 10)
+        legacy = min(timeit.repeat(lambda page=page: legacy_compile_profile_info(page), number=number, repeat=repeat)) / number
+        single = min(timeit.repeat(lambda page=page: parse_profile_record(page), number=number, repeat=repeat)) / number
+        print(f"{name:<22}{len(page):>10}{legacy * 1e6:>12.1f}{single * 1e6:>16.1f}{legacy / single:>8.2f}x")
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,264 @@
+"""
+End-to-end benchmarks, run entirely against the local mock profile server.
+
+For each cohort size a roster CSV is generated and swept twice with DataFetcher:
+a cold sweep (every page fetched and parsed) and a warm one (pages unchanged,
+answered with 304s). The swept profiles are then published into the server's
+store to time the /profiles and /profiles/id/{id} routes in-process. Every size
+runs in a fresh process so its peak RSS is its own.
+
+    python -m benchmarks.bench_suite --sizes 100 1000 --output before.json
+    python -m benchmarks.bench_suite --sizes 100 1000 --compare before.json
+
+Results are printed as a table and, with --output, written as JSON for
+comparing runs. --write-cohorts only writes the roster CSVs, e.g. to sweep the
+mock server from a running instance of the API.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+import httpx
+
+from badges import BadgeCatalog
+from benchmarks.fixtures import COHORT_SIZES, cohort_ids, write_cohort_csv
+from benchmarks.mock_server import MockProfileServer, MockSettings, ProfileSite
+from cohorts import CohortConfig, CohortRegistry
+from getData import DataFetcher
+from pipeline import parse_page
+
+BADGES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "badges.json")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50 / p90 / p99 / max of ``samples`` (seconds), in milliseconds."""
+    ordered = sorted(samples)
+    cuts = statistics.quantiles(ordered, n=100, method='inclusive') if len(ordered) > 1 else ordered * 99
+    return {
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p90_ms": round(cuts[89] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """Peak resident set size of this process and of its finished children, in MiB."""
+    if resource is None:
+        return {"peak_rss_mb": None, "peak_rss_children_mb": None}
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "peak_rss_children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def bench_parse(settings: MockSettings, pages: int = 500) -> Dict[str, float]:
+    """Single-core throughput of the parse stage (parse_profile_record plus catalog matching)."""
+    site = ProfileSite(settings)
+    catalog = BadgeCatalog.load(BADGES_FILE)
+    documents = [(profile_id, site.page(profile_id)[0].decode('utf-8')) for profile_id in cohort_ids(pages, seed=7)]
+    total_bytes = sum(len(document) for _, document in documents)
+
+    start = time.perf_counter()
+    for profile_id, document in documents:
+        parse_page(profile_id, document, catalog)
+    elapsed = time.perf_counter() - start
+    return {
+        "pages": pages,
+        "pages_per_second": round(pages / elapsed, 1),
+        "mb_per_second": round(total_bytes / elapsed / 1e6, 2),
+    }
+
+
+async def bench_routes(profile_ids: List[str], requests: int) -> Dict[str, Dict[str, float]]:
+    """Latency of the profile routes, called in-process through the ASGI app with the store already published."""
+    import server  # Imported here: it configures logging and templates at import time
+
+    logging.getLogger("server").setLevel(logging.WARNING)  # It logs every request at INFO
+    rng = random.Random(1)
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, path_for in (("/profiles", lambda: "/profiles"),
+                               ("/profiles/id/{id}", lambda: f"/profiles/id/{rng.choice(profile_ids)}")):
+            samples = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = await client.get(path_for(), headers={"Accept-Encoding": "gzip"})
+                samples.append(time.perf_counter() - start)
+                response.raise_for_status()
+            results[name] = percentiles(samples)
+    return results
+
+
+def run_cohort(size: int, settings: MockSettings, concurrency: int, parse_workers: Optional[int],
+               requests: int) -> Dict[str, Any]:
+    """Sweeps a generated cohort of ``size`` students twice and times the routes. Runs in its own process."""
+    with MockProfileServer(settings) as mock, tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, "cohort.csv")
+        profile_ids = write_cohort_csv(csv_file, size, mock.base_url)
+        fetcher = DataFetcher(csv_file, os.path.join(tmp, "profiles_data.json"), BADGES_FILE,
+                              concurrency=concurrency, requests_per_second=0, parse_workers=parse_workers)
+        try:
+            start = time.perf_counter()
+            cold_changes = asyncio.run(fetcher.extract_profiles_to_json())
+            cold = time.perf_counter() - start
+            cold_failed = len(fetcher.failed)
+
+            start = time.perf_counter()
+            warm_changes = asyncio.run(fetcher.extract_profiles_to_json())
+            warm = time.perf_counter() - start
+        finally:
+            fetcher.close()
+
+        import server
+        # Serve the swept profiles as the server's only (default) cohort
+        server.cohort_registry = CohortRegistry([CohortConfig("bench", csv_file, BADGES_FILE)],
+                                                lambda: (fetcher.profiles, time.time()))
+        server.cohort_registry.get("bench")
+        routes = asyncio.run(bench_routes(profile_ids, requests))
+        snapshot_bytes = os.path.getsize(fetcher.json_file)
+
+    return {
+        "size": size,
+        "cold_sweep_s": round(cold, 3),
+        "cold_profiles_per_second": round(size / cold, 1),
+        "cold_changed": len(cold_changes),
+        "cold_failed": cold_failed,
+        "warm_sweep_s": round(warm, 3),
+        "warm_changed": len(warm_changes),
+        "warm_failed": len(fetcher.failed),
+        "snapshot_bytes": snapshot_bytes,
+        **peak_rss_mb(),
+        "routes": routes,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    """Numeric metrics of a results document keyed by a dotted path, for comparing two runs."""
+    metrics = {f"parse.{key}": value for key, value in results["parse"].items()}
+    for cohort in results["cohorts"]:
+        prefix = f"cohort.{cohort['size']}"
+        for key, value in cohort.items():
+            if key == "routes":
+                for route, stats in value.items():
+                    metrics.update({f"{prefix}.{route}.{stat}": number for stat, number in stats.items()})
+            elif isinstance(value, (int, float)) and key != "size":
+                metrics[f"{prefix}.{key}"] = value
+    return metrics
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    parse = results["parse"]
+    print(f"\nParse: {parse['pages_per_second']} pages/s, {parse['mb_per_second']} MB/s (one core)")
+    print(f"\n{'size':>7}{'cold s':>9}{'warm s':>9}{'prof/s':>9}{'failed':>8}{'RSS MiB':>9}"
+          f"{'/profiles p50/p99 ms':>24}{'/profiles/id p50/p99 ms':>26}")
+    for cohort in results["cohorts"]:
+        all_profiles, one_profile = cohort["routes"]["/profiles"], cohort["routes"]["/profiles/id/{id}"]
+        print(f"{cohort['size']:>7}{cohort['cold_sweep_s']:>9.2f}{cohort['warm_sweep_s']:>9.2f}"
+              f"{cohort['cold_profiles_per_second']:>9.0f}{cohort['cold_failed']:>8}"
+              f"{cohort['peak_rss_mb'] or 0:>9.0f}"
+              f"{all_profiles['p50_ms']:>15.2f} / {all_profiles['p99_ms']:<6.2f}"
+              f"{one_profile['p50_ms']:>17.2f} / {one_profile['p99_ms']:<6.2f}")
+
+
+def print_comparison(baseline: Dict[str, Any], results: Dict[str, Any]) -> None:
+    before, after = flatten(baseline), flatten(results)
+    print(f"\nCompared with {baseline['meta'].get('revision') or 'baseline'} ({baseline['meta'].get('timestamp')}):")
+    print(f"{'metric':<52}{'before':>12}{'after':>12}{'change':>9}")
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{key:<52}{old:>12}{new:>12}{change:>9}")
+
+
+def main() -> None:
+    defaults = MockSettings(latency=0.02)
+    parser = argparse.ArgumentParser(description="Offline scrape and API benchmarks against a mock profile server.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(COHORT_SIZES), help="cohort sizes to sweep")
+    parser.add_argument('--latency', type=float, default=defaults.latency, help="mock response delay in seconds")
+    parser.add_argument('--min-badges', type=int, default=defaults.min_badges)
+    parser.add_argument('--max-badges', type=int, default=defaults.max_badges)
+    parser.add_argument('--padding', type=int, default=defaults.padding, help="extra bytes per mock page")
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help="fraction of 503 responses")
+    parser.add_argument('--concurrency', type=int, default=32, help="fetch concurrency")
+    parser.add_argument('--parse-workers', type=int, default=None, help="parse processes (default: CPU count)")
+    parser.add_argument('--requests', type=int, default=200, help="requests per route for latency percentiles")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--write-cohorts', metavar='DIR', help="only write cohort CSVs to DIR and exit")
+    parser.add_argument('--base-url', default="http://127.0.0.1:8900", help="profile host used by --write-cohorts")
+    args = parser.parse_args()
+
+    if args.write_cohorts:
+        os.makedirs(args.write_cohorts, exist_ok=True)
+        for size in args.sizes:
+            path = os.path.join(args.write_cohorts, f"cohort_{size}.csv")
+            write_cohort_csv(path, size, args.base_url)
+            print(f"Wrote {path}")
+        return
+
+    settings = MockSettings(latency=args.latency, min_badges=args.min_badges, max_badges=args.max_badges,
+                            padding=args.padding, error_rate=args.error_rate)
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": asdict(settings),
+            "concurrency": args.concurrency,
+            "parse_workers": args.parse_workers,
+            "requests": args.requests,
+        },
+        "parse": bench_parse(settings),
+        "cohorts": [],
+    }
+    for size in args.sizes:
+        print(f"Sweeping a cohort of {size}...")
+        # A fresh process per size, so peak RSS is not carried over from a larger run
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results["cohorts"].append(executor.submit(
+                run_cohort, size, settings, args.concurrency, args.parse_workers, args.requests).result())
+
+    print_results(results)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            print_comparison(json.load(file), results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
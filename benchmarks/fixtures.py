@@ -0,0 +1,170 @@
+"""
+Synthetic Google Cloud Skills Boost profile pages in the same HTML shape as the
+live site, for benchmarking the scraper without touching the network.
+
+Regenerate the saved fixtures with:
+
+    python -m benchmarks.fixtures
+"""
+import csv
+import html
+import os
+import random
+import uuid
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Fixture name -> number of badges on the page
+FIXTURE_SIZES = {
+    "profile_small.html": 5,
+    "profile_medium.html": 40,
+    "profile_large.html": 250,
+}
+
+# Cohort sizes the benchmark suite generates roster CSVs for
+COHORT_SIZES = (100, 1000, 10000)
+
+SAMPLE_BADGE_TITLES = [
+    "The Basics of Google Cloud Compute",
+    "Get Started with Cloud Storage",
+    "Get Started with API Gateway",
+    "Cloud Speech API: 3 Ways",
+    "Networking Fundamentals on Google Cloud",
+    "Monitoring in Google Cloud",
+    "Cloud Functions: 3 Ways",
+    "App Engine: 3 Ways",
+    "Level 3: Google Cloud Adventures",
+    "Get Started with Looker",
+    "Get Started with Dataplex",
+    "Get Started with Google Workspace Tools",
+    "Get Started with Pub/Sub",
+    "Prompt Design in Vertex AI",
+    "Analyze Images with the Cloud Vision API",
+    "Develop GenAI Apps with Gemini and Streamlit",
+]
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html lang='en'>
+<head>
+<meta charset='utf-8'>
+<title>{name} | Google Cloud Skills Boost</title>
+<link rel='stylesheet' href='/assets/application.css'>
+</head>
+<body class='public-profile'>
+<ql-header></ql-header>
+<main class='l-full'>
+<div class='public-profile__hero'>
+<ql-avatar class='profile-avatar l-mbl' size='120' src='{image}'></ql-avatar>
+<h1 class='ql-display-small'>{name}</h1>
+<p class='ql-body-large l-mbl'>
+Member since {member_since}
+</p>
+<div class='profile-league'>
+<img alt='League icon' src='https://cdn.qwiklabs.com/league.svg'>
+<h2 class='ql-headline-medium'>{league}</h2>
+<strong>{points} points</strong>
+</div>
+</div>
+<div class='profile-badges'>
+"""
+
+BADGE_TEMPLATE = """<div class='profile-badge'>
+<a class="badge-image" href="/public_profiles/{profile_id}/badges/{badge_id}"><img alt="Badge for {title}" src="https://cdn.qwiklabs.com/badges/{badge_id}.png" />
+</a><span class='ql-title-medium l-mts'>
+{title}
+</span>
+<span class='ql-body-medium l-mbs'>
+Earned {earned} EDT
+</span>
+<ql-button icon='share' type='button'>Share</ql-button>
+</div>
+"""
+
+PAGE_TAIL = """</div>
+</main>
+<ql-footer></ql-footer>
+<script src='/assets/application.js'></script>
+</body>
+</html>
+"""
+
+
+def badge_titles(count: int) -> List[str]:
+    """Returns ``count`` distinct badge titles, starting with the real GenAI ones."""
+    titles = list(SAMPLE_BADGE_TITLES[:count])
+    titles.extend(f"Skill Badge Number {idx}" for idx in range(len(titles), count))
+    return titles
+
+
+def render_profile_html(profile_id: str, name: str, badges: List[Tuple[str, date]],
+                        points: int = 0, league: str = "Gold League", member_since: int = 2023,
+                        image: Optional[str] = None) -> str:
+    """Renders a public profile page listing ``badges`` as (title, earned date) pairs."""
+    parts = [PAGE_HEAD.format(
+        name=html.escape(name),
+        image=image or f"https://cdn.qwiklabs.com/avatars/{profile_id}.png",
+        member_since=member_since,
+        league=league,
+        points=points,
+    )]
+    for badge_id, (title, earned) in enumerate(badges, start=1):
+        parts.append(BADGE_TEMPLATE.format(
+            profile_id=profile_id,
+            badge_id=badge_id,
+            title=html.escape(title),
+            earned=earned.strftime("%b %d, %Y"),
+        ))
+    parts.append(PAGE_TAIL)
+    return "".join(parts)
+
+
+def random_profile_html(profile_id: str, badge_count: int, rng: random.Random) -> str:
+    """Renders a profile with ``badge_count`` badges earned on random dates."""
+    start = date(2024, 1, 1)
+    badges = [(title, start + timedelta(days=rng.randrange(365))) for title in badge_titles(badge_count)]
+    return render_profile_html(profile_id, f"Student {profile_id[:8]}", badges,
+                               points=rng.randrange(100, 50000))
+
+
+def load_fixture(name: str) -> str:
+    """Reads one of the saved fixture pages."""
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def cohort_ids(size: int, seed: int = 2024) -> List[str]:
+    """Returns ``size`` deterministic profile IDs in the live site's UUID format."""
+    rng = random.Random(seed)
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(size)]
+
+
+def write_cohort_csv(path: str, size: int, base_url: str, seed: int = 2024) -> List[str]:
+    """
+    Writes a roster CSV in the data/genai.csv format with ``size`` students whose
+    profile URLs point at ``base_url`` (e.g. the mock server). Returns the profile IDs.
+    """
+    profile_ids = cohort_ids(size, seed)
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Student Name", "Google Cloud Skills Boost Profile URL", *SAMPLE_BADGE_TITLES])
+        blanks = [""] * len(SAMPLE_BADGE_TITLES)
+        for idx, profile_id in enumerate(profile_ids):
+            writer.writerow([f"Student {idx}", f"{base_url}/public_profiles/{profile_id}", *blanks])
+    return profile_ids
+
+
+def write_fixtures() -> None:
+    """Regenerates the saved fixture pages deterministically."""
+    rng = random.Random(2024)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for name, badge_count in FIXTURE_SIZES.items():
+        page = random_profile_html(f"{rng.getrandbits(128):032x}", badge_count, rng)
+        with open(os.path.join(FIXTURES_DIR, name), 'w', encoding='utf-8') as file:
+            file.write(page)
+        print(f"Wrote {name} ({badge_count} badges, {len(page)} bytes)")
+
+
+if __name__ == "__main__":
+    write_fixtures()
@@ -0,0 +1,181 @@
+"""
+Local stand-in for cloudskillsboost.google that serves synthetic public profile
+pages in the real HTML shape, so sweeps can be benchmarked without touching the
+live site.
+
+Every profile ID maps to a deterministic page, so repeated sweeps see the same
+content and conditional requests (ETag) come back as 304s. Latency, page size,
+badge count and error rate are configurable:
+
+    python -m benchmarks.mock_server --port 8900 --latency 0.05 --error-rate 0.01
+
+Profiles are served at /public_profiles/<id>. Use MockProfileServer to run it in
+a separate process from a benchmark.
+"""
+import argparse
+import hashlib
+import multiprocessing
+import random
+import socket
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+from benchmarks.fixtures import random_profile_html
+
+PROFILE_PATH = "/public_profiles/"
+
+
+@dataclass
+class MockSettings:
+    """How the mock site behaves."""
+    latency: float = 0.0  # Mean response delay in seconds
+    latency_jitter: float = 0.5  # Spread of the delay, as a fraction of ``latency``
+    min_badges: int = 0
+    max_badges: int = 60
+    padding: int = 0  # Extra bytes of filler markup per page, to match the size of real pages
+    error_rate: float = 0.0  # Fraction of requests answered with a 503
+    seed: int = 2024
+
+
+class ProfileSite:
+    """Renders and caches the synthetic pages for one set of MockSettings."""
+
+    def __init__(self, settings: MockSettings):
+        self.settings = settings
+        self.page = lru_cache(maxsize=2048)(self._render)
+
+    def _render(self, profile_id: str) -> Tuple[bytes, str]:
+        settings = self.settings
+        rng = random.Random(f"{settings.seed}:{profile_id}")
+        page = random_profile_html(profile_id, rng.randint(settings.min_badges, settings.max_badges), rng)
+        if settings.padding:
+            page = page.replace("</main>", f"<!-- {'x' * settings.padding} -->\n</main>", 1)
+        body = page.encode('utf-8')
+        return body, f'"{hashlib.md5(body).hexdigest()}"'
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    site: ProfileSite  # Set on the subclass built by make_server
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        settings = self.site.settings
+        if settings.latency:
+            spread = settings.latency * settings.latency_jitter
+            time.sleep(max(0.0, random.uniform(settings.latency - spread, settings.latency + spread)))
+
+        if not self.path.startswith(PROFILE_PATH):
+            self.send_empty(404)
+            return
+        if settings.error_rate and random.random() < settings.error_rate:
+            self.send_empty(503)
+            return
+
+        body, etag = self.site.page(self.path[len(PROFILE_PATH):].split('?')[0])
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_empty(self, status: int) -> None:
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def make_server(host: str, port: int, settings: MockSettings) -> ThreadingHTTPServer:
+    handler = type("BoundMockRequestHandler", (MockRequestHandler,), {"site": ProfileSite(settings)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def serve(host: str, port: int, settings: MockSettings) -> None:
+    make_server(host, port, settings).serve_forever()
+
+
+class MockProfileServer:
+    """
+    Runs the mock site in a child process for the duration of a ``with`` block, so
+    rendering pages does not compete with the code being measured for the GIL.
+
+        with MockProfileServer(MockSettings(latency=0.02)) as server:
+            url = server.profile_url("abc")
+    """
+
+    def __init__(self, settings: Optional[MockSettings] = None, host: str = "127.0.0.1",
+                 port: Optional[int] = None):
+        self.settings = settings or MockSettings()
+        self.host = host
+        self.port = port or free_port(host)
+        self._process: Optional[multiprocessing.Process] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def profile_url(self, profile_id: str) -> str:
+        return f"{self.base_url}{PROFILE_PATH}{profile_id}"
+
+    def __enter__(self) -> "MockProfileServer":
+        self._process = multiprocessing.get_context("spawn").Process(
+            target=serve, args=(self.host, self.port, self.settings), daemon=True)
+        self._process.start()
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection((self.host, self.port), timeout=0.5).close()
+                return self
+            except OSError:
+                if time.monotonic() > deadline or not self._process.is_alive():
+                    self.__exit__()
+                    raise RuntimeError("Mock profile server did not start")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc_info) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+
+def main() -> None:
+    defaults = MockSettings()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=defaults.latency, help="mean response delay in seconds")
+    parser.add_argument('--min-badges', type=int, default=defaults.min_badges)
+    parser.add_argument('--max-badges', type=int, default=defaults.max_badges)
+    parser.add_argument('--padding', type=int, default=defaults.padding, help="extra bytes per page")
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help="fraction of 503 responses")
+    args = parser.parse_args()
+
+    settings = MockSettings(latency=args.latency, min_badges=args.min_badges, max_badges=args.max_badges,
+                            padding=args.padding, error_rate=args.error_rate)
+    print(f"Serving mock profiles on http://{args.host}:{args.port}{PROFILE_PATH}<id> with {asdict(settings)}")
+    serve(args.host, args.port, settings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+from snapshot import atomic_file
+
+
+@dataclass
+class CacheEntry:
+    """Validators remembered for one profile page."""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+
+
+class ProfileCache:
+    """
+    Per-profile change cache keyed by profile ID.
+
+    Stores the ETag / Last-Modified headers and a hash of the last page that was
+    parsed, so a sweep can send conditional requests and skip re-parsing pages
+    that have not changed. The cache is persisted next to the profile data so it
+    survives restarts.
+    """
+
+    def __init__(self, cache_file: str):
+        """
+        :param cache_file: Path to the JSON file the cache is persisted to.
+        """
+        self.cache_file = cache_file
+        self.entries: Dict[str, CacheEntry] = {}
+        self.dirty = False
+
+    @staticmethod
+    def hash_content(html_content: str) -> str:
+        """Returns a stable hash of a profile page."""
+        return hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+
+    def get(self, profile_id: str) -> Optional[CacheEntry]:
+        return self.entries.get(profile_id)
+
+    def is_unchanged(self, profile_id: str, content_hash: str) -> bool:
+        """True if ``content_hash`` matches the last page parsed for ``profile_id``."""
+        entry = self.entries.get(profile_id)
+        return entry is not None and entry.content_hash == content_hash
+
+    def update(self, profile_id: str, etag: Optional[str], last_modified: Optional[str],
+               content_hash: Optional[str] = None) -> None:
+        """Records the validators for ``profile_id``, keeping the old hash if none is given."""
+        entry = self.entries.setdefault(profile_id, CacheEntry())
+        entry.etag = etag
+        entry.last_modified = last_modified
+        if content_hash is not None:
+            entry.content_hash = content_hash
+        self.dirty = True
+
+    def discard(self, profile_id: str) -> None:
+        if self.entries.pop(profile_id, None) is not None:
+            self.dirty = True
+
+    def load(self) -> None:
+        """Loads the persisted cache, starting empty if it is missing or unreadable."""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+            return
+        self.entries = {profile_id: CacheEntry(**entry) for profile_id, entry in data.items()}
+        self.dirty = False
+
+    def save(self) -> None:
+        """Writes the cache back to disk if it changed since the last load or save."""
+        if not self.dirty:
+            return
+        with atomic_file(self.cache_file) as file:
+            json.dump({profile_id: asdict(entry) for profile_id, entry in self.entries.items()}, file)
+        self.dirty = False
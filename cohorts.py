@@ -0,0 +1,258 @@
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from analytics import CohortAnalytics
+from badges import BadgeCatalog
+from events import ProfileBroadcaster
+from models import Profile, ProfileChange
+from roster import RosterFile
+from store import ProfileStore
+from studyJam import CSVProcessor
+
+# Cohort names appear in URLs: /cohorts/<name>/...
+COHORT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Returns the shared profile records of every roster and when they were published
+ProfileSource = Callable[[], Tuple[Dict[str, Profile], float]]
+
+
+@dataclass(frozen=True)
+class CohortConfig:
+    """One study jam: its roster CSV and its badge catalog."""
+    name: str
+    roster_file: str
+    badges_file: str
+    title: str = ""
+
+
+def load_cohort_configs(registry_file: str, default: CohortConfig) -> List[CohortConfig]:
+    """
+    Reads the cohort registry, a JSON file of the form
+
+        {"cohorts": [{"name": "genai", "roster": "data/genai.csv",
+                      "badges": "data/badges.json", "title": "Gen AI Study Jam"}]}
+
+    The first cohort is the default one. Without a registry file the only cohort is
+    ``default``. Raises ValueError if the registry is invalid.
+    """
+    if not os.path.exists(registry_file):
+        return [default]
+    with open(registry_file, 'r', encoding='utf-8') as file:
+        entries = json.load(file).get('cohorts') or []
+
+    configs: List[CohortConfig] = []
+    for entry in entries:
+        name = entry.get('name', '')
+        if not COHORT_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid cohort name in {registry_file}: {name!r}")
+        if any(config.name == name for config in configs):
+            raise ValueError(f"Duplicate cohort in {registry_file}: {name}")
+        if not entry.get('roster') or not entry.get('badges'):
+            raise ValueError(f"Cohort {name} in {registry_file} needs a roster and a badges file")
+        configs.append(CohortConfig(name, entry['roster'], entry['badges'], entry.get('title', '')))
+    if not configs:
+        raise ValueError(f"No cohorts in {registry_file}")
+    return configs
+
+
+class Cohort:
+    """
+    What is served for one cohort: its students' profiles matched against its own
+    badge catalog, with the store, analytics and stream broadcaster built on them.
+
+    Profile records are shared by every cohort a student is on, so a cohort works
+    on copies with its own GenAI summary filled in.
+    """
+
+    def __init__(self, config: CohortConfig):
+        """
+        :param config: The cohort's roster and badges files.
+        """
+        self.config = config
+        self.catalog: Optional[BadgeCatalog] = None
+        self.catalog_mtime: Optional[float] = None
+        self.roster = RosterFile(config.roster_file)
+        self.roster_ids: List[str] = []
+        self.members: FrozenSet[str] = frozenset()
+        self.profiles: Dict[str, Profile] = {}
+        self.store = ProfileStore()
+        self.analytics = CohortAnalytics()
+        self.broadcaster = ProfileBroadcaster(self.store)
+        self.last_used = time.monotonic()
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    def refresh_sources(self) -> bool:
+        """Reads the roster and catalog again if their content changed. Returns whether either did."""
+        config = self.config
+        if not os.path.exists(config.badges_file):
+            # Same as for the first cohort: derive the catalog from the roster's badge columns
+            CSVProcessor(config.roster_file, config.badges_file).process()
+
+        changed = False
+        mtime = os.path.getmtime(config.badges_file)
+        if mtime != self.catalog_mtime:
+            self.catalog = BadgeCatalog.load(config.badges_file)
+            self.catalog_mtime = mtime
+            changed = True
+        if self.roster.refresh() is not None:
+            self.roster_ids = list(self.roster.entries)
+            self.members = frozenset(self.roster_ids)
+            changed = True
+        return changed
+
+    def view(self, profile: Profile) -> Profile:
+        """A copy of a shared record with the GenAI summary for this cohort's catalog."""
+        return self.catalog.apply(replace(profile, general=replace(profile.general)))
+
+    def load(self, profiles: Dict[str, Profile], published_at: float) -> None:
+        """Builds everything from the shared records. CPU-heavy for a large cohort."""
+        self.refresh_sources()
+        self.profiles = {profile_id: self.view(profiles[profile_id])
+                         for profile_id in self.roster_ids if profile_id in profiles}
+        self.analytics.rebuild(self.profiles.values(), self.catalog)
+        self.store.catalog = self.catalog
+        self.store.publish(self.profiles, published_at)
+
+    def update(self, changes: List[ProfileChange], profiles: Dict[str, Profile],
+               published_at: float) -> Optional[List[ProfileChange]]:
+        """
+        Applies a sweep's changes and publishes a new snapshot if any of them concern
+        this cohort. Returns those changes, or None if the roster or catalog changed
+        and everything was rebuilt instead.
+        """
+        if self.refresh_sources():
+            self.load(profiles, published_at)
+            return None
+
+        mine = [
+            ProfileChange(change.profile_id, self.profiles.get(change.profile_id),
+                          self.view(change.new) if change.new is not None else None)
+            for change in changes if change.profile_id in self.members
+        ]
+        if not mine:
+            return mine
+
+        updated = {change.profile_id: change.new for change in mine}
+        merged = ((profile_id, updated[profile_id] if profile_id in updated else self.profiles.get(profile_id))
+                  for profile_id in self.roster_ids)
+        self.profiles = {profile_id: profile for profile_id, profile in merged if profile is not None}
+        self.analytics.apply(mine)
+        self.store.publish(self.profiles, published_at)
+        return mine
+
+
+class CohortRegistry:
+    """
+    The configured cohorts, each loaded the first time it is asked for.
+
+    Profiles are fetched once for all cohorts, so a student on several rosters costs
+    one fetch; a cohort is built from the shared records when it is first used and
+    kept up to date with every sweep's changes while it is loaded. Cohorts unused
+    for ``idle_timeout`` seconds, and the least recently used ones beyond
+    ``max_loaded``, are unloaded again. The default cohort and cohorts with stream
+    clients connected are never unloaded.
+    """
+
+    def __init__(self, configs: List[CohortConfig], source: ProfileSource, max_loaded: int = 4,
+                 idle_timeout: float = 3600):
+        """
+        :param configs: The cohorts; the first one is the default.
+        :param source: Returns the shared profile records and when they were published.
+        :param max_loaded: Most cohorts kept loaded at once.
+        :param idle_timeout: Seconds without requests after which a cohort is unloaded.
+        """
+        self.configs: Dict[str, CohortConfig] = {config.name: config for config in configs}
+        self.default = configs[0].name
+        self.source = source
+        self.max_loaded = max_loaded
+        self.idle_timeout = idle_timeout
+        self.loaded: Dict[str, Cohort] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.configs
+
+    def peek(self, name: str) -> Optional[Cohort]:
+        """The cohort if it is loaded, or None. Cheap enough for the event loop."""
+        cohort = self.loaded.get(name)
+        if cohort is not None:
+            cohort.last_used = time.monotonic()
+        return cohort
+
+    def get(self, name: str) -> Optional[Cohort]:
+        """
+        The cohort, loaded first if needed, or None if there is no such cohort. Loading
+        is CPU-heavy; call this from a worker thread when running inside the event loop.
+        """
+        if name not in self.configs:
+            return None
+        cohort = self.peek(name)
+        if cohort is not None:
+            return cohort
+        with self._lock:
+            cohort = self.peek(name)
+            if cohort is None:
+                cohort = Cohort(self.configs[name])
+                cohort.load(*self.source())
+                self.loaded[name] = cohort
+                self._evict(keep=name)
+        return cohort
+
+    def evict_idle(self) -> List[str]:
+        """Unloads the cohorts that have been idle too long. Returns their names."""
+        with self._lock:
+            return self._evict()
+
+    def _evict(self, keep: Optional[str] = None) -> List[str]:
+        now = time.monotonic()
+        evictable = sorted(
+            (cohort for cohort in self.loaded.values()
+             if cohort.name not in (self.default, keep) and not cohort.broadcaster.subscribers),
+            key=lambda cohort: cohort.last_used)
+        over = len(self.loaded) - self.max_loaded
+        evicted = []
+        for cohort in evictable:
+            if over <= 0 and now - cohort.last_used < self.idle_timeout:
+                break
+            del self.loaded[cohort.name]
+            evicted.append(cohort.name)
+            over -= 1
+        return evicted
+
+    def update(self, changes: List[ProfileChange]) -> List[Tuple[Cohort, Optional[List[ProfileChange]]]]:
+        """
+        Applies a sweep's changes to every loaded cohort. Returns each cohort that
+        published a new snapshot with its changes (None after a rebuild), for the
+        caller to push to stream clients from the event loop.
+        """
+        with self._lock:
+            profiles, published_at = self.source()
+            published = []
+            for cohort in list(self.loaded.values()):
+                cohort_changes = cohort.update(changes, profiles, published_at)
+                if cohort_changes is None or cohort_changes:
+                    published.append((cohort, cohort_changes))
+            return published
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """The configured cohorts, with the size of the loaded ones."""
+        summary = []
+        for name, config in self.configs.items():
+            cohort = self.loaded.get(name)
+            summary.append({
+                "name": name,
+                "title": config.title or name,
+                "default": name == self.default,
+                "loaded": cohort is not None,
+                "students": len(cohort.profiles) if cohort is not None else None,
+                "rejected_rows": len(cohort.roster.rejects) if cohort is not None else None,
+            })
+        return summary
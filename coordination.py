@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY,
+    command TEXT NOT NULL,  -- 'refresh' (argument: profile ID) or 'profile'
+    argument TEXT,
+    issued_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schedule (
+    profile_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL  -- RefreshScheduler.status() as JSON
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class LeaderLock:
+    """
+    Elects the one server process that refreshes profiles when several workers run.
+
+    Whoever holds an exclusive lock on the lock file is the leader. The lock is
+    tied to the open file, so the operating system releases it if the leader exits
+    or crashes, and a follower that calls ``acquire`` again takes over.
+    """
+
+    def __init__(self, lock_file: str):
+        """
+        :param lock_file: Path of the lock file, created if it does not exist.
+        """
+        self.lock_file = lock_file
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        """Tries to take the lock without waiting. Returns whether this process holds it."""
+        if self._file is not None:
+            return True
+        file = open(self.lock_file, 'a+', encoding='utf-8')
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            file.close()
+            return False
+        # The holder's PID, for whoever wonders which worker is refreshing
+        file.seek(0)
+        file.truncate()
+        file.write(f"{os.getpid()}\n")
+        file.flush()
+        self._file = file
+        return True
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+class WorkerState:
+    """
+    Small SQLite database through which server processes share what used to be
+    process globals: admin commands for the leader (on-demand refreshes, profiling),
+    the leader's refresh schedule and named values such as the last profile report.
+    """
+
+    def __init__(self, db_file: str):
+        """
+        :param db_file: Path to the SQLite database, created if it does not exist.
+        """
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_file, timeout=10, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def send(self, command: str, argument: Optional[str] = None) -> None:
+        """Queues a command for the leader."""
+        with self._lock, self._connection:
+            self._connection.execute("INSERT INTO commands (command, argument, issued_at) VALUES (?, ?, ?)",
+                                     (command, argument, time.time()))
+
+    def take_commands(self) -> List[Tuple[str, Optional[str]]]:
+        """Removes and returns the queued commands, oldest first."""
+        with self._lock, self._connection:
+            rows = self._connection.execute("SELECT id, command, argument FROM commands ORDER BY id").fetchall()
+            if rows:
+                self._connection.execute("DELETE FROM commands WHERE id <= ?", (rows[-1][0],))
+        return [(command, argument) for _, command, argument in rows]
+
+    def save_schedule(self, statuses: Iterable[Dict[str, Any]]) -> None:
+        """Replaces the shared copy of the refresh schedule."""
+        rows = [(status["profile_id"], json.dumps(status)) for status in statuses]
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM schedule")
+            self._connection.executemany("INSERT INTO schedule (profile_id, status) VALUES (?, ?)", rows)
+
+    def schedule_status(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute("SELECT status FROM schedule WHERE profile_id = ?",
+                                           (profile_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO state (key, value, updated_at) VALUES (?, ?, ?)",
+                                     (key, value, time.time()))
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import time
+import weakref
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from leaderboard import DEFAULT_SORT_KEY, SORT_KEYS
+from metrics import STREAM_BYTES, STREAM_SUBSCRIBERS
+from models import ProfileChange
+from store import ProfileStore, ProfileSnapshot
+
+# Largest N a client can subscribe to with ?top=N
+MAX_TOP = 100
+# Messages a subscriber may fall behind by before it is sent a fresh snapshot instead
+MAX_PENDING = 32
+# Published versions kept so a reconnecting client can catch up without a full snapshot
+HISTORY_SIZE = 64
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15.0
+# Seconds after which a stream is closed; EventSource clients reconnect and resume from
+# Last-Event-ID. Keeps a server restart from waiting on connections that never end.
+MAX_STREAM_AGE = 600.0
+
+# Every broadcaster, one per loaded cohort, for the subscriber gauge
+BROADCASTERS: "weakref.WeakSet[ProfileBroadcaster]" = weakref.WeakSet()
+STREAM_SUBSCRIBERS.set_function(lambda: sum(len(broadcaster.subscribers) for broadcaster in list(BROADCASTERS)))
+
+_UNCHANGED = object()
+
+
+def merge_patch(old: Any, new: Any) -> Any:
+    """
+    Returns the JSON Merge Patch (RFC 7396) that turns ``old`` into ``new``: changed
+    keys with their new value, nested objects patched recursively and removed keys
+    as null. Returns ``_UNCHANGED`` if the two are equal.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        patch = {}
+        for key, value in new.items():
+            if key not in old:
+                patch[key] = value
+            else:
+                nested = merge_patch(old[key], value)
+                if nested is not _UNCHANGED:
+                    patch[key] = nested
+        patch.update((key, None) for key in old if key not in new)
+        return patch if patch else _UNCHANGED
+    return _UNCHANGED if old == new else new
+
+
+def compose_patches(first: Any, second: Any) -> Any:
+    """A single merge patch with the same effect as applying ``first`` and then ``second``."""
+    if isinstance(first, dict) and isinstance(second, dict):
+        combined = dict(first)
+        for key, value in second.items():
+            combined[key] = compose_patches(combined[key], value) if key in combined else value
+        return combined
+    return second
+
+
+def encode(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class Subscription:
+    """One connected client and what it asked for: every profile, one profile ID, or the top N."""
+
+    def __init__(self, profile_id: Optional[str] = None, top: Optional[int] = None,
+                 sort_key: str = DEFAULT_SORT_KEY):
+        self.profile_id = profile_id
+        self.top = top
+        self.sort_key = sort_key
+        self.queue: asyncio.Queue = asyncio.Queue(MAX_PENDING)
+        self.last_top: Optional[bytes] = None
+
+
+class ProfileBroadcaster:
+    """
+    Fans out profile changes to Server-Sent Events clients.
+
+    A client first gets a ``snapshot`` event, then one ``patch`` event per published
+    sweep that touched what it subscribed to. The data of a patch event is a JSON
+    Merge Patch against the snapshot: ``{profile key: changes}``, where a new profile
+    comes as its full record and a removed one as null. Top-N subscribers get a
+    ``top`` event with the new rows whenever the top N change. Messages are built
+    once per sweep and filter and shared by all clients with the same filter.
+
+    Event IDs are ``<boot>-<version>``. A client that reconnects with a recent
+    Last-Event-ID is sent the patches it missed instead of a new snapshot.
+    """
+
+    def __init__(self, store: ProfileStore):
+        """
+        :param store: The store whose published snapshots are streamed.
+        """
+        self.store = store
+        self.boot = int(time.time())
+        self.version = 0
+        self.subscribers: Set[Subscription] = set()
+        self.history: Deque[Tuple[int, Optional[Dict[str, Any]]]] = deque(maxlen=HISTORY_SIZE)
+        BROADCASTERS.add(self)
+
+    @property
+    def event_id(self) -> str:
+        return f"{self.boot}-{self.version}"
+
+    def message(self, event: str, data: bytes) -> bytes:
+        STREAM_BYTES.inc(len(data), event=event)
+        return b"id: %s\nevent: %s\ndata: %s\n\n" % (self.event_id.encode(), event.encode(), data)
+
+    def subscribe(self, profile_id: Optional[str] = None, top: Optional[int] = None,
+                  sort_key: str = DEFAULT_SORT_KEY) -> Subscription:
+        """Registers a client. Raises ValueError for an invalid filter."""
+        if profile_id is not None and top is not None:
+            raise ValueError("Subscribe to either one profile or the top N, not both")
+        if top is not None and not 1 <= top <= MAX_TOP:
+            raise ValueError(f"top must be between 1 and {MAX_TOP}")
+        if sort_key not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort_key}")
+        subscription = Subscription(profile_id, top, sort_key)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscribers.discard(subscription)
+
+    @staticmethod
+    def top_rows(snapshot: ProfileSnapshot, sort_key: str, top: int) -> bytes:
+        return encode(snapshot.leaderboard.rankings[(sort_key, "all")].rows[:top])
+
+    def snapshot_message(self, subscription: Subscription) -> bytes:
+        """The full current state for ``subscription``."""
+        snapshot = self.store.snapshot
+        if subscription.top is not None:
+            subscription.last_top = self.top_rows(snapshot, subscription.sort_key, subscription.top)
+            return self.message("top", subscription.last_top)
+        if subscription.profile_id is not None:
+            entry = snapshot.by_id.get(subscription.profile_id)
+            return self.message("snapshot", encode({entry[0]: entry[1].to_dict()} if entry else {}))
+        return self.message("snapshot", snapshot.body.body)
+
+    def resume_messages(self, subscription: Subscription, last_event_id: Optional[str]) -> Optional[List[bytes]]:
+        """
+        Messages that bring a client which last saw ``last_event_id`` up to date, or
+        None if it is unknown or too old and the client needs a snapshot.
+        """
+        boot, _, version = (last_event_id or "").partition("-")
+        if boot != str(self.boot) or not version.isdigit():
+            return None
+        version = int(version)
+        if version == self.version:
+            return []
+        missed = [patches for published, patches in self.history if published > version]
+        if len(missed) != self.version - version or any(patches is None for patches in missed):
+            return None  # Fell out of the history, or a resync happened in between
+
+        if subscription.top is not None:
+            return [self.snapshot_message(subscription)]
+        merged: Dict[str, Any] = {}
+        for patches in missed:
+            for key, patch in patches.items():
+                if subscription.profile_id is None or key == subscription.profile_id:
+                    merged[key] = compose_patches(merged[key], patch) if key in merged else patch
+        return [self.message("patch", encode(merged))] if merged else []
+
+    def deliver(self, subscription: Subscription, message: Optional[bytes]) -> None:
+        """Queues a message, or a resync marker (None) if the client has fallen too far behind."""
+        try:
+            subscription.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(None)
+
+    def publish(self, changes: Optional[List[ProfileChange]]) -> None:
+        """
+        Sends the changes of a sweep that was just published to the store. With
+        ``changes=None`` (e.g. the badge catalog changed and every record may differ)
+        every client is sent a fresh snapshot instead.
+        """
+        self.version += 1
+        if changes is None:
+            self.history.append((self.version, None))
+            for subscription in list(self.subscribers):
+                self.deliver(subscription, None)
+            return
+
+        patches: Dict[str, Any] = {}
+        for change in changes:
+            old = change.old.to_dict() if change.old is not None else None
+            new = change.new.to_dict() if change.new is not None else None
+            patch = new if old is None or new is None else merge_patch(old, new)
+            if patch is not _UNCHANGED:
+                patches[change.profile_id] = patch
+        self.history.append((self.version, patches))
+        if not self.subscribers:
+            return
+
+        snapshot = self.store.snapshot
+        everything: Optional[bytes] = None
+        tops: Dict[Tuple[str, int], bytes] = {}
+        for subscription in list(self.subscribers):
+            if subscription.top is not None:
+                group = (subscription.sort_key, subscription.top)
+                if group not in tops:
+                    tops[group] = self.top_rows(snapshot, *group)
+                if tops[group] != subscription.last_top:
+                    subscription.last_top = tops[group]
+                    self.deliver(subscription, self.message("top", tops[group]))
+            elif subscription.profile_id is not None:
+                if subscription.profile_id in patches:
+                    patch = {subscription.profile_id: patches[subscription.profile_id]}
+                    self.deliver(subscription, self.message("patch", encode(patch)))
+            elif patches:
+                if everything is None:
+                    everything = self.message("patch", encode(patches))
+                else:
+                    STREAM_BYTES.inc(len(everything), event="patch")
+                self.deliver(subscription, everything)
+
+    async def stream(self, subscription: Subscription, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """The Server-Sent Events byte stream for one client."""
+        try:
+            # Tell EventSource clients how soon to reconnect after the stream ends
+            yield b"retry: 1000\n\n"
+            messages = self.resume_messages(subscription, last_event_id)
+            for message in messages if messages is not None else [self.snapshot_message(subscription)]:
+                yield message
+
+            deadline = time.monotonic() + MAX_STREAM_AGE
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), min(KEEPALIVE_INTERVAL, remaining))
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield message if message is not None else self.snapshot_message(subscription)
+        finally:
+            self.unsubscribe(subscription)
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import CIRCUIT_OPEN, FETCH_DURATION, UPSTREAM_ERRORS, UPSTREAM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header, given either in seconds or as an HTTP date, into seconds from now."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class FetchResult:
+    """Outcome of fetching one page."""
+    url: str
+    status_code: Optional[int]
+    html_content: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code == 200
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status_code == 304
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host so that a concurrent sweep does not
+    burst past what the upstream site tolerates.
+    """
+
+    def __init__(self, requests_per_second: float) -> None:
+        """
+        :param requests_per_second: Maximum request rate per host. ``0`` disables limiting.
+        """
+        self.interval: float = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+
+    async def wait(self, host: str) -> None:
+        """Sleeps until the next free request slot for ``host``."""
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        # Reserve the slot before sleeping so concurrent callers queue up behind it
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, host: str, seconds: float) -> None:
+        """Holds back every request to ``host`` for ``seconds``, e.g. after a 429."""
+        self._next_slot[host] = max(self._next_slot.get(host, 0.0), time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    After ``failure_threshold`` pages in a row from a host could not be fetched,
+    even with retries, the circuit opens and requests to it fail straight away,
+    without touching the network, for ``reset_timeout`` seconds. Then a single trial
+    request is let through: if it succeeds the circuit closes again, otherwise it
+    stays open for another ``reset_timeout``. Kept across sweeps so an outage is remembered between them.
+    """
+
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 30.0) -> None:
+        """
+        :param failure_threshold: Consecutive failed fetches that open the circuit.
+        :param reset_timeout: Seconds the circuit stays open before a trial request.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._probing: Dict[str, bool] = {}
+
+    def allow(self, host: str) -> bool:
+        """True if a request to ``host`` may be sent now."""
+        opened_at = self._opened_at.get(host)
+        if opened_at is None:
+            return True
+        if time.monotonic() - opened_at < self.reset_timeout or self._probing.get(host):
+            return False
+        self._probing[host] = True  # Half-open: let exactly one request through
+        return True
+
+    def record_success(self, host: str) -> None:
+        if self._opened_at.pop(host, None) is not None:
+            logger.info(f"Circuit closed for {host}")
+            CIRCUIT_OPEN.set(0, host=host)
+        self._failures.pop(host, None)
+        self._probing.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        failures = self._failures[host] = self._failures.get(host, 0) + 1
+        if failures >= self.failure_threshold or self._probing.pop(host, False):
+            if host not in self._opened_at:
+                logger.warning(f"Circuit open for {host} after {failures} failures, "
+                               f"pausing requests for {self.reset_timeout:.0f}s")
+                CIRCUIT_OPEN.set(1, host=host)
+            self._opened_at[host] = time.monotonic()
+
+
+class FetchEngine:
+    """
+    Asynchronous page fetcher backed by a pooled, keep-alive HTTP client.
+
+    Use it as an async context manager so the connection pool is opened once per
+    sweep and closed afterwards:
+
+        async with FetchEngine(concurrency=16) as engine:
+            pages = await engine.fetch_all(urls)
+    """
+
+    def __init__(self, concurrency: int = 16, requests_per_second: float = 25.0, timeout: float = 15.0,
+                 retries: int = 3, backoff: float = 0.5, max_retry_after: float = 60.0,
+                 circuit_breaker: Optional[CircuitBreaker] = None) -> None:
+        """
+        :param concurrency: Maximum number of requests in flight at once.
+        :param requests_per_second: Per-host request rate limit.
+        :param timeout: Timeout in seconds for connecting to and reading from the upstream site.
+        :param retries: Extra attempts for network errors, 429s and 5xx responses.
+        :param backoff: Base delay in seconds of the jittered exponential backoff between attempts.
+        :param max_retry_after: Longest Retry-After delay that is honoured, in seconds.
+        :param circuit_breaker: Breaker shared across sweeps; a fresh one is used if not given.
+        """
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "FetchEngine":
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            timeout=httpx.Timeout(self.timeout),
+            follow_redirects=True,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff: a random delay up to ``backoff * 2 ** attempt``."""
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    async def fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> FetchResult:
+        """
+        Fetches a single page.
+
+        When ``etag`` or ``last_modified`` from a previous fetch are given the request
+        is made conditional, and an unchanged page comes back as a 304 with no body.
+        Network errors, 429s and 5xx responses are retried with jittered exponential
+        backoff, honouring Retry-After. While the host's circuit is open no request is
+        sent at all. A page that still could not be fetched is logged and returned with
+        empty content and ``error`` set, so one bad profile never aborts the sweep.
+        """
+        if self._client is None:
+            raise RuntimeError("FetchEngine must be used as an async context manager")
+
+        headers: Dict[str, str] = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        host = urlsplit(url).netloc
+        result = FetchResult(url, None)
+        sent = answered = False
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            if not self.circuit_breaker.allow(host):
+                UPSTREAM_ERRORS.inc(reason="circuit_open")
+                result = FetchResult(url, None, error="circuit open")
+                break
+
+            retry_after = None
+            sent = True
+            async with self._semaphore:
+                await self.rate_limiter.wait(host)
+                try:
+                    response = await self._client.get(url, headers=headers)
+                except httpx.HTTPError as e:
+                    result = FetchResult(url, None, error=repr(e))
+                    UPSTREAM_ERRORS.inc(reason=type(e).__name__)
+                else:
+                    result = FetchResult(url, response.status_code,
+                                         etag=response.headers.get('ETag'),
+                                         last_modified=response.headers.get('Last-Modified'))
+                    if result.status_code not in RETRY_STATUSES:
+                        self.circuit_breaker.record_success(host)
+                        answered = True
+                        break
+                    result.error = f"HTTP {result.status_code}"
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    UPSTREAM_ERRORS.inc(reason=str(result.status_code))
+
+            if attempt == self.retries:
+                break
+            UPSTREAM_RETRIES.inc()
+            if retry_after is not None:
+                # The host asked everyone to slow down, not just this request
+                delay = min(retry_after, self.max_retry_after)
+                self.rate_limiter.pause(host, delay)
+            else:
+                delay = self.backoff_delay(attempt)
+            await asyncio.sleep(delay)
+
+        if sent and not answered:
+            # One failure per page that could not be fetched, however many attempts it took
+            self.circuit_breaker.record_failure(host)
+        if result.ok:
+            result.html_content = response.text
+        elif not result.not_modified and result.error != "circuit open":
+            if result.error is None:
+                result.error = f"HTTP {result.status_code}"
+                UPSTREAM_ERRORS.inc(reason=str(result.status_code))
+            logger.warning(f"Failed to retrieve {url}: {result.error}")
+        result.elapsed = time.perf_counter() - start
+        FETCH_DURATION.observe(result.elapsed, outcome="ok" if result.ok or result.not_modified else "failed")
+        return result
+
+    async def fetch_all(self, targets: List[Tuple[str, Optional[str], Optional[str]]]) -> List[FetchResult]:
+        """
+        Fetches all pages concurrently and returns the results in the same order.
+
+        :param targets: (url, etag, last_modified) for each page; the validators may be None.
+        """
+        return await asyncio.gather(*(self.fetch(url, etag, last_modified) for url, etag, last_modified in targets))
+
+    async def stream(self, targets: List[Tuple[str, Optional[str], Optional[str]]], queue: asyncio.Queue) -> None:
+        """
+        Fetches all pages and puts ``(index, FetchResult)`` on ``queue`` as each one arrives.
+
+        A fixed set of ``concurrency`` workers pulls from ``targets``, and each waits for
+        room on the queue before fetching its next page. With a bounded queue, fetching
+        pauses while the consumer is behind, so no more than ``concurrency`` plus the
+        queue's ``maxsize`` pages are held in memory however long the roster is.
+
+        :param targets: (url, etag, last_modified) for each page; the validators may be None.
+        :param queue: Queue the results are put on, in completion order.
+        """
+        pending = iter(enumerate(targets))
+
+        async def worker() -> None:
+            for index, (url, etag, last_modified) in pending:
+                await queue.put((index, await self.fetch(url, etag, last_modified)))
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(targets)))))
@@ -1,28 +1,89 @@
-import csv
+import asyncio
+import heapq
 import json
 import os  # Import os to check file existence
-from typing import List, Dict
-from scraper import Scraper
+import time
+from dataclasses import replace
+from typing import Collection, List, Dict, Optional, Sequence, Set, Tuple, Union
+from badges import BadgeCatalog
+from cache import ProfileCache
+from fetcher import CircuitBreaker, FetchEngine, FetchResult
+from metrics import LAST_SWEEP, PARSE_DURATION, SLOWEST_FETCHES, SWEEP_DURATION, SWEEP_PAGES
+from models import Profile, ProfileChange
+from pipeline import ParsePool
+from roster import RosterFile, normalize_profile_url
+from snapshot import SnapshotReader, SnapshotWriter
 from studyJam import CSVProcessor  
 
+# How many of the slowest profiles of a sweep are reported
+SLOWEST_FETCHES_REPORTED = 10
+
 
 class DataFetcher:
-    def __init__(self, csv_file: str, json_file: str, badges_file: str):
-        self.csv_file = csv_file
+    def __init__(self, csv_file: Union[str, Sequence[str]], json_file: str, badges_file: str,
+                 concurrency: int = 16, requests_per_second: float = 25.0, timeout: float = 15.0,
+                 cache_file: Optional[str] = None, write_sidecar: bool = True,
+                 parse_workers: Optional[int] = None, queue_size: int = 64, retries: int = 3):
+        # One roster CSV, or one per cohort: a student on several rosters is fetched once
+        self.csv_files: List[str] = [csv_file] if isinstance(csv_file, str) else list(csv_file)
+        self.csv_file = self.csv_files[0]
         self.json_file = json_file
         self.badges_file = badges_file
 
+        # Profiles from the last sweep, merged into incrementally and kept between sweeps
+        self.profiles: Dict[str, Profile] = {}
+        self.profiles_loaded = False
+
+        # (profile ID, profile URL) for every student, rebuilt only when a CSV changes.
+        # roster_version goes up each time, so callers can tell when to resync with it
+        self.rosters = [RosterFile(csv_file) for csv_file in self.csv_files]
+        self.roster: List[Tuple[str, str]] = []
+        self.roster_version = 0
+
+        # Profiles whose page could not be fetched in the last sweep
+        self.failed: Set[str] = set()
+        # (fetch seconds, profile ID) of every page fetched in the current sweep
+        self.fetch_timings: List[Tuple[float, str]] = []
+
+        # Also publish an NDJSON sidecar next to the JSON file for lazy loading
+        self.write_sidecar = write_sidecar
+
+        # Badge catalog, reloaded only when the badges file changes
+        self.catalog: Optional[BadgeCatalog] = None
+        self.catalog_mtime: Optional[float] = None
+
+        # Change cache used to skip profiles whose page has not changed
+        self.cache = ProfileCache(cache_file or os.path.splitext(json_file)[0] + "_cache.json")
+
+        # Settings for the async fetch engine used during a sweep
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.timeout = timeout
+        self.retries = retries
+        # Kept across sweeps so an upstream outage is remembered between them
+        self.circuit_breaker = CircuitBreaker()
+
+        # Worker processes that parse fetched pages, and the bounded queue between the two stages
+        self.parse_pool = ParsePool(parse_workers)
+        self.queue_size = queue_size
+
         # Initialize the CSVProcessor to read the filtered badges (GenAI badges)
         self.csv_processor = CSVProcessor(self.csv_file, self.badges_file)
 
-    def read_csv(self) -> List[Dict[str, str]]:
-        """Reads the CSV file and returns a list of dictionaries with student names and profile URLs."""
-        data: List[Dict[str, str]] = []
-        with open(self.csv_file, mode='r', encoding='utf-8-sig') as file:
-            csv_reader = csv.DictReader(file)
-            for row in csv_reader:
-                data.append(row)
-        return data
+    def read_roster(self) -> List[Tuple[str, str]]:
+        """
+        Returns (profile ID, profile URL) for every valid student on any of the rosters,
+        each once, parsing a CSV again only if its content changed.
+        """
+        diffs = [roster.refresh() for roster in self.rosters]
+        if any(diff is not None for diff in diffs):
+            merged: Dict[str, str] = {}
+            for roster in self.rosters:
+                for profile_id, profile_url in roster.entries.items():
+                    merged.setdefault(profile_id, profile_url)
+            self.roster = list(merged.items())
+            self.roster_version += 1
+        return self.roster
 
     def check_and_generate_badges_file(self) -> None:
         """
@@ -42,66 +103,232 @@ class DataFetcher:
     @staticmethod
     def extract_id_from_url(profile_url: str) -> str:
         """Extracts the profile ID from the Google Cloud Skills Boost profile URL."""
-        return profile_url.split('/')[-1]
-
-    def load_genai_badges(self) -> List[str]:
-        """Loads the GenAI badges from the JSON file."""
-        with open(self.badges_file, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        return [badge['title'] for badge in data['genai_badges']]
-
-    def extract_profiles_to_json(self) -> None:
-        """Extracts profile information from the CSV and saves it to a JSON file."""
-        students = self.read_csv()
-        genai_badges = self.load_genai_badges()
-        all_profiles: Dict[str, Dict] = {}
-
-        for student in students:
-            student_name = student['Student Name']
-            profile_url = student['Google Cloud Skills Boost Profile URL']
-            profile_id = self.extract_id_from_url(profile_url)
-
-            print(f"Processing profile for: {student_name} - {profile_url}")
-            scraper = Scraper(profile_url)
-            scraper.fetch_page()
-            profile_info = scraper.compile_profile_info()
-
-            # Add the ID to the general section of the profile_info
-            profile_info['general']['profile_id'] = profile_id
-
-            # Add the profile name to the general section
-            profile_info['general']['profile_name'] = profile_info.pop('profile_name')
-
-            # Rename "number_of_badges_earned" to "Number of badges"
-            profile_info['general']['Number of badges'] = profile_info['general'].pop('number_of_badges_earned')
-
-            # Count the number of GenAI badges earned
-            user_badges = profile_info.get('badges', {})
-            genai_badges_earned = {badge: details for badge, details in user_badges.items() if badge in genai_badges}
-            
-            # Check for "Level 3: Google Cloud Adventures (Game)" badge specifically
-            level_3_game_badge_title = "Level 3: Google Cloud Adventures (Game)"
-            games_done = genai_badges_earned.get(level_3_game_badge_title, None) is not None
-            
-            # Adjust the count of GenAI badges if the game badge is earned
-            if games_done:
-                profile_info['genai_badges_Earned'] = {badge: details for badge, details in genai_badges_earned.items() if badge != level_3_game_badge_title}
+        try:
+            return normalize_profile_url(profile_url)[0]
+        except ValueError:
+            return profile_url.split('?')[0].split('#')[0].rstrip('/').split('/')[-1]
+
+    def load_catalog(self) -> BadgeCatalog:
+        """Returns the badge catalog, reading the badges file again only if it was modified."""
+        self.reload_catalog()
+        return self.catalog
+
+    def reload_catalog(self) -> List[ProfileChange]:
+        """
+        Reads the badges file again if it was modified and re-applies the catalog to
+        the profiles. Returns the profiles whose GenAI summary changed, which have to
+        be saved and published like any other change.
+        """
+        mtime = os.path.getmtime(self.badges_file)
+        if self.catalog is not None and mtime == self.catalog_mtime:
+            return []
+        self.catalog = BadgeCatalog.load(self.badges_file)
+        self.catalog_mtime = mtime
+        changes = []
+        for profile_id, profile in self.profiles.items():
+            updated = self.catalog.apply(replace(profile, general=replace(profile.general)))
+            if updated != profile:
+                changes.append(ProfileChange(profile_id, profile, updated))
+        for change in changes:
+            self.profiles[change.profile_id] = change.new
+        return changes
+
+    def save_profiles(self, all_profiles: Dict[str, Profile]) -> None:
+        """
+        Writes the compiled profiles to the JSON file.
+
+        Records are streamed out one at a time to a temporary file that is then renamed
+        over the JSON file, so readers never see a half-written file.
+        """
+        with SnapshotWriter(self.json_file, sidecar=self.write_sidecar) as writer:
+            for profile_id, profile in all_profiles.items():
+                writer.write(profile_id, profile.to_dict())
+
+    def read_profiles(self) -> Dict[str, Profile]:
+        """
+        Reads the saved profiles, one record at a time from the NDJSON sidecar when it
+        is up to date, otherwise from the JSON file.
+        """
+        if SnapshotReader.available(self.json_file):
+            try:
+                with SnapshotReader(self.json_file) as reader:
+                    return {profile_id: Profile.from_dict(info) for profile_id, info in reader.items()}
+            except (OSError, ValueError):
+                pass  # Being rewritten right now; the JSON file is always complete
+        with open(self.json_file, 'r', encoding='utf-8') as json_file:
+            return {profile_id: Profile.from_dict(info) for profile_id, info in json.load(json_file).items()}
+
+    def load_profiles(self) -> None:
+        """Loads the previous sweep's profiles and change cache so the next sweep can be incremental."""
+        try:
+            self.profiles = self.read_profiles()
+            self.cache.load()
+            # The next sweep checks the GenAI summaries against the current catalog
+            self.catalog_mtime = None
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Without the old records every profile has to be parsed again
+            self.profiles = {}
+        self.profiles_loaded = True
+
+    async def fetch_stage(self, engine: FetchEngine, targets: List[Tuple[str, Optional[str], Optional[str]]],
+                          queue: asyncio.Queue, parsers: int) -> None:
+        """First stage of a sweep: fetches every page onto the queue, then one stop marker per parse task."""
+        await engine.stream(targets, queue)
+        for _ in range(parsers):
+            await queue.put(None)
+
+    async def parse_stage(self, queue: asyncio.Queue, profile_ids: List[str], changed: List[ProfileChange]) -> None:
+        """
+        Parse and merge stages of a sweep: takes fetched pages off the queue until a
+        stop marker arrives, parses the changed ones in the process pool and merges
+        the new records into the dataset. A page that failed to fetch or parse keeps
+        its last good record, marked stale.
+        """
+        while (item := await queue.get()) is not None:
+            index, result = item
+            profile_id = profile_ids[index]
+            old = self.profiles.get(profile_id)
+            self.fetch_timings.append((result.elapsed, profile_id))
+
+            if not result.ok and not result.not_modified:
+                SWEEP_PAGES.inc(result="failed")
+                profile = self.mark_stale(profile_id, old)
+            elif self.needs_parse(profile_id, result):
+                SWEEP_PAGES.inc(result="parsed")
+                try:
+                    with PARSE_DURATION.time():
+                        profile = await self.parse_pool.parse(profile_id, result.html_content)
+                except Exception as e:
+                    print(f"Failed to parse profile {profile_id}: {e!r}")
+                    self.cache.discard(profile_id)
+                    profile = self.mark_stale(profile_id, old)
             else:
-                profile_info['genai_badges_Earned'] = genai_badges_earned
+                # Unchanged page; a record left stale by an earlier failure is current again
+                SWEEP_PAGES.inc(result="not_modified" if result.not_modified else "unchanged")
+                profile = replace(old, stale=False) if old.stale else old
+
+            if profile is None or old == profile:
+                continue
+
+            # Use profile_id as the key in the profiles dictionary
+            changed.append(ProfileChange(profile_id, old, profile))
+            self.profiles[profile_id] = profile
+
+    def mark_stale(self, profile_id: str, old: Optional[Profile]) -> Optional[Profile]:
+        """
+        Keeps the last good record of a profile whose page could not be fetched or
+        parsed, flagged as stale, rather than replacing it with an empty one. Returns
+        None if there is no good record yet: the student is left out until a fetch works.
+        """
+        self.failed.add(profile_id)
+        if old is None:
+            return None
+        return old if old.stale else replace(old, stale=True)
 
-            profile_info['general']['number_of_genai_skill_badges'] = len(profile_info['genai_badges_Earned'])
+    def needs_parse(self, profile_id: str, result: FetchResult) -> bool:
+        """Updates the change cache for a fetched page and returns whether it has to be parsed."""
+        if result.not_modified:
+            return False
+        content_hash = ProfileCache.hash_content(result.html_content)
+        unchanged = profile_id in self.profiles and self.cache.is_unchanged(profile_id, content_hash)
+        self.cache.update(profile_id, result.etag, result.last_modified, content_hash)
+        return not unchanged
 
-            # Count the number of "Level 3: Google Cloud Adventures (Game)" badges
-            profile_info['general']['games_done'] = int(games_done)  # Will be 1 if true, otherwise 0
+    async def extract_profiles_to_json(self, profile_ids: Optional[Collection[str]] = None) -> List[ProfileChange]:
+        """
+        Extracts profile information from the CSV and saves it to a JSON file.
+
+        If ``profile_ids`` is given only those students are fetched, which is how the
+        refresh scheduler updates the profiles that are due; everyone else keeps their
+        current record. Students no longer on the roster are dropped either way.
+
+        Profile pages are fetched concurrently through a pooled FetchEngine, so the
+        caller's event loop keeps serving requests while the sweep is running. Requests
+        are conditional on the ETag / Last-Modified seen last time, and a page whose
+        content hash is unchanged is not parsed again. Fetched pages go through a
+        bounded queue to a process pool that parses them on every core; only changed
+        profiles are merged into the dataset, and the JSON file is only rewritten when
+        something changed.
 
-            # Use profile_id as the key in the all_profiles dictionary
-            all_profiles[profile_id] = profile_info
+        Args:
+            profile_ids: IDs of the profiles to refresh, or None for the whole roster.
+
+        Returns:
+            The profiles that were added, changed or removed, with their old and new records.
+            IDs whose page could not be fetched are left in ``self.failed``.
+        """
+        start = time.perf_counter()
+        if not self.profiles_loaded:
+            await asyncio.to_thread(self.load_profiles)
 
-        with open(self.json_file, 'w', encoding='utf-8') as json_file:
-            json.dump(all_profiles, json_file, ensure_ascii=False, indent=4)
+        roster = await asyncio.to_thread(self.read_roster)
+        catalog_changes = await asyncio.to_thread(self.reload_catalog)
+        catalog = self.catalog
+
+        wanted = set(profile_ids) if profile_ids is not None else None
+        targets = []
+        fetched_ids = []
+        for profile_id, profile_url in roster:
+            if wanted is not None and profile_id not in wanted:
+                continue
+            entry = self.cache.get(profile_id) if profile_id in self.profiles else None
+            targets.append((profile_url, entry.etag if entry else None, entry.last_modified if entry else None))
+            fetched_ids.append(profile_id)
+        self.failed = set()
+        self.fetch_timings = []
+        print(f"Fetching {len(targets)} profiles...")
+
+        changed: List[ProfileChange] = []
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.parse_pool.start(catalog)
+        # Enough parse tasks to keep every worker busy while results are merged
+        parsers = [asyncio.create_task(self.parse_stage(queue, fetched_ids, changed))
+                   for _ in range(max(1, self.parse_pool.workers) * 2)]
+        async with FetchEngine(self.concurrency, self.requests_per_second, self.timeout,
+                               retries=self.retries, circuit_breaker=self.circuit_breaker) as engine:
+            fetching = asyncio.create_task(self.fetch_stage(engine, targets, queue, len(parsers)))
+            try:
+                await asyncio.gather(fetching, *parsers)
+            finally:
+                for task in [fetching, *parsers]:
+                    task.cancel()
+
+        # Drop students that are no longer on the roster
+        roster_ids = [profile_id for profile_id, _ in roster]
+        on_roster = set(roster_ids)
+        for profile_id in [profile_id for profile_id in self.profiles if profile_id not in on_roster]:
+            changed.append(ProfileChange(profile_id, self.profiles.pop(profile_id), None))
+            self.cache.discard(profile_id)
+        # Pages finish in any order; keep the saved data in roster order
+        self.profiles = {profile_id: self.profiles[profile_id] for profile_id in roster_ids
+                         if profile_id in self.profiles}
+        if catalog_changes:
+            # One change per profile, from its record before the catalog was applied
+            merged = {change.profile_id: change for change in catalog_changes}
+            for change in changed:
+                first = merged.get(change.profile_id)
+                merged[change.profile_id] = ProfileChange(change.profile_id, first.old if first else change.old,
+                                                          change.new)
+            changed = list(merged.values())
+
+        if changed or not os.path.exists(self.json_file):
+            # Keep the blocking file write off the event loop
+            await asyncio.to_thread(self.save_profiles, self.profiles)
+            print(f"{len(changed)} profiles changed, saved to {self.json_file}")
+        else:
+            print("No profile changes since the last sweep")
+        await asyncio.to_thread(self.cache.save)
 
-        print(f"Profile data extracted and saved to {self.json_file}")
+        SWEEP_DURATION.observe(time.perf_counter() - start)
+        LAST_SWEEP.set(time.time())
+        SLOWEST_FETCHES.clear()
+        for elapsed, profile_id in heapq.nlargest(SLOWEST_FETCHES_REPORTED, self.fetch_timings):
+            SLOWEST_FETCHES.set(round(elapsed, 4), profile_id=profile_id)
+        return changed
 
+    def close(self) -> None:
+        """Stops the parse worker processes."""
+        self.parse_pool.close()
 
 if __name__ == "__main__":
     csv_file_path = "data/genai.csv"
@@ -110,4 +337,7 @@ if __name__ == "__main__":
 
     # Now run the DataFetcher process
     data_fetcher = DataFetcher(csv_file_path, json_file_path, badge_names)
-    data_fetcher.extract_profiles_to_json()
+    try:
+        asyncio.run(data_fetcher.extract_profiles_to_json())
+    finally:
+        data_fetcher.close()
@@ -0,0 +1,190 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Collection, Dict, Iterable, List, Optional, Tuple
+
+from models import Profile, ProfileChange
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS badge_events (
+    profile_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    badge_title TEXT NOT NULL,
+    earned_on TEXT,
+    change INTEGER NOT NULL  -- +1 badge gained, -1 badge no longer shown
+);
+CREATE INDEX IF NOT EXISTS badge_events_profile ON badge_events (profile_id, recorded_at);
+CREATE INDEX IF NOT EXISTS badge_events_time ON badge_events (recorded_at);
+
+CREATE TABLE IF NOT EXISTS point_events (
+    profile_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    points INTEGER NOT NULL,
+    delta INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS point_events_profile ON point_events (profile_id, recorded_at);
+CREATE INDEX IF NOT EXISTS point_events_time ON point_events (recorded_at);
+"""
+
+
+def to_timestamp(value: Optional[str]) -> Optional[float]:
+    """Parses an ISO date or datetime query parameter into a Unix timestamp (UTC if no zone is given)."""
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def to_isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds')
+
+
+class HistoryStore:
+    """
+    Append-only SQLite log of what changed on each profile between sweeps.
+
+    Only differences are written: badges that appeared or disappeared and point
+    changes. A sweep in which nothing changed adds no rows, so the database grows
+    with student progress rather than with the number of sweeps.
+    """
+
+    def __init__(self, db_file: str):
+        """
+        :param db_file: Path to the SQLite database, created if it does not exist.
+        """
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def diff(change: ProfileChange) -> Tuple[List[Tuple[str, Optional[str], int]], Optional[Tuple[int, int]]]:
+        """
+        Returns the badge events (title, earned date, +1/-1) and the (points, delta)
+        point event for one change. A profile seen for the first time, on the first
+        sweep or when a student joins the roster, has no events: the badges and
+        points it already has were not earned since the last sweep.
+        """
+        if change.old is None or change.old == Profile(change.profile_id, stale=True):
+            # Also the empty placeholder earlier versions kept for a failed first fetch
+            return [], None
+        old_badges = change.old.badges
+        new_badges = change.new.badges
+        badge_events = [
+            (title, badge.earned_on.isoformat() if badge.earned_on else None, 1)
+            for title, badge in new_badges.items() if title not in old_badges
+        ]
+        badge_events.extend(
+            (title, badge.earned_on.isoformat() if badge.earned_on else None, -1)
+            for title, badge in old_badges.items() if title not in new_badges
+        )
+
+        old_points = change.old.general.earned_points
+        new_points = change.new.general.earned_points
+        point_event = (new_points, new_points - old_points) if new_points != old_points else None
+        return badge_events, point_event
+
+    def record(self, changes: Iterable[ProfileChange], recorded_at: Optional[float] = None) -> int:
+        """
+        Appends the deltas for a sweep's changes in one transaction. Removed profiles
+        are not recorded. Returns the number of rows written.
+        """
+        recorded_at = time.time() if recorded_at is None else recorded_at
+        badge_rows = []
+        point_rows = []
+        for change in changes:
+            if change.new is None:
+                continue
+            badge_events, point_event = self.diff(change)
+            badge_rows.extend((change.profile_id, recorded_at, title, earned_on, sign)
+                              for title, earned_on, sign in badge_events)
+            if point_event is not None:
+                point_rows.append((change.profile_id, recorded_at, *point_event))
+
+        if not badge_rows and not point_rows:
+            return 0
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO badge_events (profile_id, recorded_at, badge_title, earned_on, change) "
+                "VALUES (?, ?, ?, ?, ?)", badge_rows)
+            self._connection.executemany(
+                "INSERT INTO point_events (profile_id, recorded_at, points, delta) VALUES (?, ?, ?, ?)", point_rows)
+        return len(badge_rows) + len(point_rows)
+
+    def profile_timeline(self, profile_id: str, since: Optional[float] = None,
+                         until: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Returns one profile's recorded events between ``since`` and ``until``, oldest first."""
+        since = since if since is not None else 0.0
+        until = until if until is not None else float('inf')
+        with self._lock:
+            badge_rows = self._connection.execute(
+                "SELECT recorded_at, badge_title, earned_on, change FROM badge_events "
+                "WHERE profile_id = ? AND recorded_at BETWEEN ? AND ?", (profile_id, since, until)).fetchall()
+            point_rows = self._connection.execute(
+                "SELECT recorded_at, points, delta FROM point_events "
+                "WHERE profile_id = ? AND recorded_at BETWEEN ? AND ?", (profile_id, since, until)).fetchall()
+
+        events = [
+            {"recorded_at": recorded_at, "type": "badge_gained" if change > 0 else "badge_removed",
+             "badge": title, "earned_on": earned_on}
+            for recorded_at, title, earned_on, change in badge_rows
+        ]
+        events.extend(
+            {"recorded_at": recorded_at, "type": "points", "points": points, "delta": delta}
+            for recorded_at, points, delta in point_rows
+        )
+        events.sort(key=lambda event: event["recorded_at"])
+        for event in events:
+            event["recorded_at"] = to_isoformat(event["recorded_at"])
+        return events
+
+    def cohort_progress(self, since: Optional[float] = None, until: Optional[float] = None,
+                        profile_ids: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """
+        Totals for the whole cohort between ``since`` and ``until``, with a per-day
+        breakdown (UTC). ``profile_ids`` limits them to the students of one cohort.
+        """
+        since = since if since is not None else 0.0
+        until = until if until is not None else float('inf')
+        where = "recorded_at BETWEEN ? AND ?"
+        params: Tuple = (since, until)
+        if profile_ids is not None:
+            where += " AND profile_id IN (SELECT value FROM json_each(?))"
+            params += (json.dumps(list(profile_ids)),)
+        with self._lock:
+            badge_days = self._connection.execute(
+                "SELECT date(recorded_at, 'unixepoch') AS day, "
+                "SUM(change > 0), SUM(change < 0), COUNT(DISTINCT profile_id) FROM badge_events "
+                f"WHERE {where} GROUP BY day", params).fetchall()
+            point_days = self._connection.execute(
+                "SELECT date(recorded_at, 'unixepoch') AS day, SUM(delta) FROM point_events "
+                f"WHERE {where} GROUP BY day", params).fetchall()
+            active = self._connection.execute(
+                "SELECT COUNT(*) FROM ("
+                f"SELECT profile_id FROM badge_events WHERE {where} "
+                f"UNION SELECT profile_id FROM point_events WHERE {where})", params + params).fetchone()[0]
+
+        days: Dict[str, Dict[str, Any]] = {}
+        for day, gained, removed, students in badge_days:
+            days[day] = {"date": day, "badges_gained": gained, "badges_removed": removed,
+                         "students_earning": students, "points_gained": 0}
+        for day, points in point_days:
+            days.setdefault(day, {"date": day, "badges_gained": 0, "badges_removed": 0,
+                                  "students_earning": 0, "points_gained": 0})["points_gained"] = points
+
+        per_day = [days[day] for day in sorted(days)]
+        return {
+            "badges_gained": sum(day["badges_gained"] for day in per_day),
+            "points_gained": sum(day["points_gained"] for day in per_day),
+            "active_students": active,
+            "days": per_day,
+        }
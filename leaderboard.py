@@ -0,0 +1,145 @@
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import Profile
+
+# Sort keys accepted by the API, all of them integer columns of a leaderboard row
+SORT_KEYS = ("number_of_genai_skill_badges", "games_done", "earned_points", "number_of_badges")
+DEFAULT_SORT_KEY = "number_of_genai_skill_badges"
+
+# Filters accepted by the API
+FILTERS = ("all", "completed", "games_done", "completed_all")
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def encode_cursor(profile_id: str) -> str:
+    return base64.urlsafe_b64encode(profile_id.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> str:
+    """Inverse of encode_cursor. Raises ValueError for a malformed cursor."""
+    try:
+        return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class Ranking:
+    """One precomputed ordering of the cohort for a sort key and filter, best first."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.positions: Dict[str, int] = {row['profile_id']: idx for idx, row in enumerate(rows)}
+
+    def page(self, descending: bool, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """Returns ``limit`` rows starting ``offset`` rows into the requested direction."""
+        if descending:
+            return self.rows[offset:offset + limit]
+        end = len(self.rows) - offset
+        return self.rows[max(0, end - limit):max(0, end)][::-1]
+
+    def offset_after(self, profile_id: str, descending: bool) -> int:
+        """Offset of the row following ``profile_id``. Raises KeyError if it is not ranked."""
+        position = self.positions[profile_id]
+        return position + 1 if descending else len(self.rows) - position
+
+
+class Leaderboard:
+    """
+    Rankings for every sort key and filter, computed once per data snapshot.
+
+    A request only slices one of the prepared lists, so its cost does not grow with
+    the size of the cohort.
+    """
+
+    def __init__(self, profiles: Dict[str, Profile], skill_badge_total: int = 0):
+        """
+        :param profiles: Profile records keyed the same way as profiles_data.json.
+        :param skill_badge_total: Skill badges needed to count as "completed". When 0, the
+                                  highest skill badge count in the cohort is used.
+        """
+        summaries = [self.summarize(profile) for profile in profiles.values()]
+        if not skill_badge_total:
+            skill_badge_total = max((row['number_of_genai_skill_badges'] for row in summaries), default=0)
+        self.skill_badge_total = skill_badge_total
+
+        self.rankings: Dict[Tuple[str, str], Ranking] = {}
+        for sort_key in SORT_KEYS:
+            # Ties fall back to points and then name, so the order is stable between refreshes
+            ordered = sorted(summaries, key=lambda row, key=sort_key: (
+                -row[key], -row['earned_points'], row['profile_name'], row['profile_id']))
+
+            # Competition ranking ("1, 2, 2, 4") on the unfiltered order
+            ranked: List[Dict[str, Any]] = []
+            previous_value, rank = None, 0
+            for idx, row in enumerate(ordered, start=1):
+                if row[sort_key] != previous_value:
+                    previous_value, rank = row[sort_key], idx
+                ranked.append({"rank": rank, **row})
+
+            for filter_name in FILTERS:
+                rows = [row for row in ranked if self.matches(row, filter_name)]
+                self.rankings[(sort_key, filter_name)] = Ranking(rows)
+
+    @staticmethod
+    def summarize(profile: Profile) -> Dict[str, Any]:
+        """Extracts the fields shown on the leaderboard."""
+        general = profile.general
+        return {
+            "profile_id": profile.profile_id,
+            "profile_name": profile.profile_name,
+            "profile_image": general.profile_image,
+            "league": general.league,
+            "earned_points": general.earned_points,
+            "number_of_genai_skill_badges": general.number_of_genai_skill_badges,
+            "games_done": general.games_done,
+            "number_of_badges": profile.number_of_badges,
+        }
+
+    def matches(self, row: Dict[str, Any], filter_name: str) -> bool:
+        completed = self.skill_badge_total > 0 and row['number_of_genai_skill_badges'] >= self.skill_badge_total
+        if filter_name == "completed":
+            return completed
+        if filter_name == "games_done":
+            return row['games_done'] > 0
+        if filter_name == "completed_all":
+            return completed and row['games_done'] > 0
+        return True
+
+    def query(self, sort_key: str = DEFAULT_SORT_KEY, descending: bool = True, filter_name: str = "all",
+              limit: int = DEFAULT_LIMIT, offset: int = 0, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Returns one page of the leaderboard.
+
+        ``cursor`` is the ``next_cursor`` of a previous page and takes precedence over
+        ``offset``; it resumes after the last profile of that page. Raises ValueError
+        for an unknown sort key or filter, or a cursor that does not match any profile.
+        """
+        ranking = self.rankings.get((sort_key, filter_name))
+        if ranking is None:
+            raise ValueError(f"Unknown sort key or filter: {sort_key}, {filter_name}")
+
+        if cursor:
+            try:
+                offset = ranking.offset_after(decode_cursor(cursor), descending)
+            except KeyError as e:
+                raise ValueError("Cursor no longer matches a ranked profile") from e
+
+        limit = max(1, min(limit, MAX_LIMIT))
+        offset = max(0, offset)
+        rows = ranking.page(descending, offset, limit)
+        has_more = offset + len(rows) < len(ranking.rows)
+
+        return {
+            "sort": sort_key,
+            "order": "desc" if descending else "asc",
+            "filter": filter_name,
+            "total": len(ranking.rows),
+            "offset": offset,
+            "limit": limit,
+            "items": rows,
+            "next_cursor": encode_cursor(rows[-1]['profile_id']) if rows and has_more else None,
+        }
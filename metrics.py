@@ -0,0 +1,292 @@
+import abc
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
+
+# Default latency buckets in seconds, as used by the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def escape_label(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(abc.ABC):
+    """
+    Base class of the metric types. A metric is only exposed on /metrics once it is
+    added to REGISTRY; the application's metrics are declared and registered at the
+    bottom of this module.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        :param name: Metric name in Prometheus format, e.g. ``gcsb_sweep_duration_seconds``.
+        :param documentation: Text of the ``# HELP`` line.
+        :param labelnames: Names of the labels every sample of this metric carries.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: Sequence[Tuple[str, str]] = ()) -> str:
+        pairs = [*zip(self.labelnames, values), *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        """The sample lines of the metric in the text exposition format."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """A value that only goes up, e.g. the number of failed fetches."""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {format_value(value)}" for key, value in values]
+
+
+class Gauge(Metric):
+    """
+    A value that can go up and down. Either set explicitly, or computed when the
+    metrics are collected from a function given to ``set_function``, which returns
+    a number or, for a labelled gauge, a dict of label value tuples to numbers.
+    """
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], object]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def set_function(self, function: Callable[[], object]) -> None:
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            result = self._function()
+            values = result if isinstance(result, dict) else {(): result}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{self._format_labels(key)} {format_value(value)}"
+                for key, value in sorted(values.items()) if value is not None]
+
+
+class Histogram(Metric):
+    """Counts observations, e.g. request durations, into cumulative buckets."""
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+                self._sums[key] = 0.0
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[idx] += 1
+                    break
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes how long the ``with`` block took."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """The set of metrics exposed on /metrics."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Adds a metric and returns it. Raises ValueError if its name is already taken."""
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+# The application's metrics. They live here rather than in the modules that update
+# them so that each is created exactly once per process, however often those
+# modules are imported (server.py is imported twice by a multi-worker server).
+
+# Fetching (fetcher.py)
+FETCH_DURATION = REGISTRY.register(Histogram(
+    "gcsb_profile_fetch_duration_seconds", "Time to fetch one profile page, including retries.", ["outcome"]))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "gcsb_upstream_errors_total", "Failed requests to the profile site, by HTTP status or error type.", ["reason"]))
+UPSTREAM_RETRIES = REGISTRY.register(Counter(
+    "gcsb_upstream_retries_total", "Requests to the profile site that were retried."))
+CIRCUIT_OPEN = REGISTRY.register(Gauge(
+    "gcsb_circuit_open", "1 while the circuit breaker for a host is open.", ["host"]))
+
+# Sweeps (getData.py)
+SWEEP_DURATION = REGISTRY.register(Histogram(
+    "gcsb_sweep_duration_seconds", "Wall time of a refresh sweep.",
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)))
+SWEEP_PAGES = REGISTRY.register(Counter(
+    "gcsb_sweep_pages_total",
+    "Fetched pages by outcome: not_modified (304) and unchanged (same content hash) "
+    "are change cache hits, parsed pages were new or changed.", ["result"]))
+PARSE_DURATION = REGISTRY.register(Histogram(
+    "gcsb_profile_parse_duration_seconds", "Time to parse one profile page in the parse pool, including the hand-off."))
+LAST_SWEEP = REGISTRY.register(Gauge(
+    "gcsb_last_sweep_timestamp_seconds", "Unix time at which the last sweep finished."))
+SLOWEST_FETCHES = REGISTRY.register(Gauge(
+    "gcsb_slowest_profile_fetch_seconds", "Fetch time of the slowest profiles of the last sweep.", ["profile_id"]))
+
+# Rosters (roster.py)
+ROSTER_STUDENTS = REGISTRY.register(Gauge(
+    "gcsb_roster_students", "Students on a roster CSV after validation and deduplication.", ["roster"]))
+ROSTER_REJECTS = REGISTRY.register(Gauge(
+    "gcsb_roster_rejected_rows", "Rows of a roster CSV skipped as invalid or duplicate.", ["roster"]))
+
+# Event stream (events.py)
+STREAM_SUBSCRIBERS = REGISTRY.register(Gauge(
+    "gcsb_stream_subscribers", "Clients connected to /profiles/stream."))
+STREAM_BYTES = REGISTRY.register(Counter(
+    "gcsb_stream_bytes_total", "Bytes sent to /profiles/stream clients, by event.", ["event"]))
+
+# Serving (server.py)
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "gcsb_http_request_duration_seconds", "Latency of API requests.", ["route", "method", "status"]))
+SNAPSHOT_AGE = REGISTRY.register(Gauge(
+    "gcsb_snapshot_age_seconds", "Seconds since the served profile data was published."))
+PROFILES_SERVED = REGISTRY.register(Gauge(
+    "gcsb_profiles", "Profiles served, by loaded cohort.", ["cohort"]))
+STALE_PROFILES = REGISTRY.register(Gauge(
+    "gcsb_stale_profiles", "Profiles whose latest fetch failed."))
+FAILING_PROFILES = REGISTRY.register(Gauge(
+    "gcsb_profile_consecutive_failures",
+    "Failed fetches in a row, for each profile that is currently failing.", ["profile_id"]))
+REFRESHER = REGISTRY.register(Gauge(
+    "gcsb_refresher", "1 if this worker refreshes profiles, 0 if it follows the refresher's snapshots."))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request in ``histogram``,
+    labelled with the route's path template (not the concrete path, to keep the
+    number of series bounded), the method and the response status. Routes listed in
+    ``exclude``, such as long-lived event streams, are not recorded.
+    """
+
+    def __init__(self, app, histogram: Histogram, exclude: Sequence[str] = ()):
+        self.app = app
+        self.histogram = histogram
+        self.exclude = frozenset(exclude)
+        self._templates: Optional[Dict[int, List[Tuple[FrozenSet[str], str]]]] = None
+
+    def route_template(self, scope) -> str:
+        if self._templates is None:
+            # Routes and mounts both end up in scope["endpoint"] once the router matched them.
+            # An endpoint served under several paths is told apart by its path parameters
+            self._templates = {}
+            for route in scope["app"].routes:
+                endpoint = getattr(route, "endpoint", None) or getattr(route, "app", None)
+                params = frozenset(getattr(route, "param_convertors", {}))
+                self._templates.setdefault(id(endpoint), []).append((params, route.path))
+        templates = self._templates.get(id(scope.get("endpoint")))
+        if not templates:
+            return "unmatched"
+        params = frozenset(scope.get("path_params", {}))
+        return next((path for names, path in templates if names == params), templates[0][1])
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = self.route_template(scope)
+            if route not in self.exclude:
+                self.histogram.observe(time.perf_counter() - start, route=route,
+                                       method=scope["method"], status=str(status[0]))
@@ -0,0 +1,144 @@
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+EARNED_DATE_PATTERN = re.compile(r"Earned\s+([A-Z][a-z]{2})\s+(\d{1,2}),\s+(\d{4})")
+
+
+def parse_points(points: Any) -> int:
+    """Turns an "N points" string into N, treating anything unparsable as 0."""
+    if isinstance(points, int):
+        return points
+    try:
+        return int(str(points).split()[0])
+    except (IndexError, ValueError):
+        return 0
+
+
+@lru_cache(maxsize=4096)
+def parse_earned_date(earned_date: str) -> Optional[date]:
+    """Parses "Earned Oct 10, 2024 EDT" into a date. Returns None if it does not match."""
+    match = EARNED_DATE_PATTERN.search(earned_date)
+    if not match:
+        return None
+    try:
+        return datetime.strptime(" ".join(match.groups()), "%b %d %Y").date()
+    except ValueError:
+        return None
+
+
+@dataclass(slots=True)
+class Badge:
+    """A badge shown on a profile."""
+    title: str
+    image: str
+    earned_date: str = "Unknown"
+    earned_on: Optional[date] = None
+
+    @classmethod
+    def create(cls, title: str, image: str, earned_date: str = "Unknown") -> "Badge":
+        """Builds a badge with an interned title and a parsed earned date."""
+        return cls(sys.intern(title), image, earned_date, parse_earned_date(earned_date))
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"badge_image": self.image, "earned_date": self.earned_date}
+
+
+@dataclass(slots=True)
+class GeneralStats:
+    """Headline numbers from the top of a profile page."""
+    league: str = "Unknown"
+    member_since: str = "Unknown"
+    earned_points: int = 0
+    profile_image: str = "No Image"
+    number_of_genai_skill_badges: int = 0
+    games_done: int = 0
+
+
+@dataclass(slots=True)
+class Profile:
+    """
+    One student's scraped profile.
+
+    ``badges`` maps badge title to Badge in page order. ``genai_badges`` holds the
+    titles of the GenAI skill badges among them, in the same order, and
+    ``badge_mask`` has a bit set for every catalog badge earned (see BadgeCatalog).
+    ``stale`` is set when the latest fetch of the page failed and the record is the
+    last one that was fetched successfully.
+    """
+    profile_id: str
+    profile_name: str = "Unknown"
+    general: GeneralStats = field(default_factory=GeneralStats)
+    badges: Dict[str, Badge] = field(default_factory=dict)
+    genai_badges: Tuple[str, ...] = ()
+    badge_mask: int = 0
+    stale: bool = False
+
+    @property
+    def number_of_badges(self) -> int:
+        return len(self.badges)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializes the profile to the profiles_data.json schema."""
+        general = self.general
+        data = {
+            "general": {
+                "league": general.league,
+                "member_since": general.member_since,
+                "earned_points": f"{general.earned_points} points",
+                "profile_image": general.profile_image,
+                "profile_id": self.profile_id,
+                "profile_name": self.profile_name,
+                "Number of badges": self.number_of_badges,
+                "number_of_genai_skill_badges": general.number_of_genai_skill_badges,
+                "games_done": general.games_done,
+            },
+            "badges": {title: badge.to_dict() for title, badge in self.badges.items()},
+            "genai_badges_Earned": {title: self.badges[title].to_dict() for title in self.genai_badges},
+        }
+        if self.stale:
+            data["stale"] = True
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Profile":
+        """Inverse of to_dict, for reading back profiles_data.json."""
+        general = data.get('general', {})
+        badges = {
+            sys.intern(title): Badge.create(title, details.get('badge_image', ""), details.get('earned_date', "Unknown"))
+            for title, details in data.get('badges', {}).items()
+        }
+        return cls(
+            profile_id=general.get('profile_id', ""),
+            profile_name=general.get('profile_name', "Unknown"),
+            general=GeneralStats(
+                league=general.get('league', "Unknown"),
+                member_since=general.get('member_since', "Unknown"),
+                earned_points=parse_points(general.get('earned_points')),
+                profile_image=general.get('profile_image', "No Image"),
+                number_of_genai_skill_badges=general.get('number_of_genai_skill_badges', 0),
+                games_done=general.get('games_done', 0),
+            ),
+            badges=badges,
+            genai_badges=tuple(sys.intern(title) for title in data.get('genai_badges_Earned', {}) if title in badges),
+            stale=data.get('stale', False),
+        )
+
+
+class ProfileChange(NamedTuple):
+    """A profile that was added (old is None), updated, or removed (new is None) by a sweep."""
+    profile_id: str
+    old: Optional[Profile]
+    new: Optional[Profile]
+
+
+def diff_profiles(old: Dict[str, Profile], new: Dict[str, Profile]) -> List[ProfileChange]:
+    """The changes that turn one set of profiles into another, e.g. two saved snapshots."""
+    changes = [ProfileChange(profile_id, old.get(profile_id), profile)
+               for profile_id, profile in new.items() if old.get(profile_id) != profile]
+    changes.extend(ProfileChange(profile_id, profile, None) for profile_id, profile in old.items()
+                   if profile_id not in new)
+    return changes
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from badges import BadgeCatalog
+from models import Profile
+from scraper import parse_profile_record
+
+logger = logging.getLogger(__name__)
+
+# Catalog used by parse_page inside a pool worker, installed once by init_parse_worker
+_worker_catalog: Optional[BadgeCatalog] = None
+
+
+def init_parse_worker(catalog: Optional[BadgeCatalog]) -> None:
+    """Pool initializer: keeps the catalog in the worker so it is not sent with every page."""
+    global _worker_catalog
+    _worker_catalog = catalog
+
+
+def parse_page(profile_id: str, html_content: str, catalog: Optional[BadgeCatalog] = None) -> Profile:
+    """
+    Parses a profile page and applies the badge catalog to it. Runs in a pool worker,
+    so it only takes and returns picklable values.
+    """
+    catalog = catalog if catalog is not None else _worker_catalog
+    profile = parse_profile_record(html_content, profile_id)
+    return catalog.apply(profile) if catalog is not None else profile
+
+
+def intern_titles(profile: Profile) -> Profile:
+    """Re-interns badge titles of a profile that was unpickled from a worker process."""
+    badges = {}
+    for title, badge in profile.badges.items():
+        badge.title = sys.intern(title)
+        badges[badge.title] = badge
+    profile.badges = badges
+    profile.genai_badges = tuple(sys.intern(title) for title in profile.genai_badges)
+    return profile
+
+
+class ParsePool:
+    """
+    Process pool for the CPU-bound parse stage of a sweep.
+
+    Regex parsing and catalog matching hold the GIL, so they are moved to worker
+    processes; the event loop keeps fetching and serving requests meanwhile. The
+    pool is started lazily and kept between sweeps, and restarted only when the
+    badge catalog changes. With ``workers=0`` pages are parsed in a thread of
+    this process instead.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        :param workers: Number of worker processes, defaults to the number of CPUs.
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.catalog: Optional[BadgeCatalog] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self, catalog: BadgeCatalog) -> None:
+        """Makes sure the pool is running with ``catalog``."""
+        if catalog is self.catalog and (self._executor is not None or not self.workers):
+            return
+        self.close()
+        self.catalog = catalog
+        if self.workers:
+            self._executor = ProcessPoolExecutor(self.workers, initializer=init_parse_worker, initargs=(catalog,))
+
+    async def parse(self, profile_id: str, html_content: str) -> Profile:
+        """Parses one page in the pool."""
+        if self._executor is None:
+            return await asyncio.to_thread(parse_page, profile_id, html_content, self.catalog)
+        try:
+            profile = await asyncio.get_running_loop().run_in_executor(
+                self._executor, parse_page, profile_id, html_content)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for the next pages
+            logger.warning("Parse pool broke, restarting it")
+            self.close()
+            self.start(self.catalog)
+            return await asyncio.to_thread(parse_page, profile_id, html_content, self.catalog)
+        return intern_titles(profile)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional, Tuple
+
+FrameKey = Tuple[str, int, str]  # (file, first line, function)
+
+# Innermost frames of threads parked in a pool waiting for work; such stacks are not counted
+IDLE_FRAMES = {("threading.py", "wait"), ("queue.py", "get"), ("thread.py", "_worker")}
+
+
+class SamplingProfiler:
+    """
+    Low-overhead sampling profiler for one refresh cycle.
+
+    A background thread takes a snapshot of every other thread's stack each
+    ``interval`` seconds. A function's "self" count is how often it was the
+    innermost frame, its "total" count how often it was anywhere on a stack.
+    Samples are wall-clock, so time the event loop spends waiting on the network
+    shows up too; threads idling in a pool are skipped. Covers the event loop and
+    worker threads of this process, not other processes.
+
+        with SamplingProfiler() as profiler:
+            await run_get_data_script()
+        print(profiler.report())
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        :param interval: Seconds between samples.
+        """
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.started_at: Optional[float] = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.sample(frame)
+
+    def sample(self, frame) -> None:
+        """Counts one stack, innermost frame first."""
+        if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+            return
+        self.samples += 1
+        seen = set()
+        innermost = True
+        while frame is not None:
+            code = frame.f_code
+            key: FrameKey = (code.co_filename, code.co_firstlineno, code.co_name)
+            if innermost:
+                self.self_counts[key] += 1
+                innermost = False
+            if key not in seen:  # Recursion counts once per stack
+                self.total_counts[key] += 1
+                seen.add(key)
+            frame = frame.f_back
+
+    def report(self, top: int = 25) -> str:
+        """The ``top`` functions by self time and by total time, as a plain text table."""
+        lines = [f"Sampled {self.samples} stacks over {self.elapsed:.2f}s (every {self.interval * 1000:.0f} ms)"]
+        if not self.samples:
+            return lines[0]
+        for title, counts in (("self", self.self_counts), ("total", self.total_counts)):
+            lines.append("")
+            lines.append(f"Top {top} by {title} time:")
+            lines.append(f"{'%':>7}  {'samples':>8}  function")
+            for (filename, line, function), count in counts.most_common(top):
+                location = os.path.relpath(filename) if not filename.startswith("<") else filename
+                lines.append(f"{count / self.samples * 100:>6.1f}%  {count:>8}  {function} ({location}:{line})")
+        return "\n".join(lines)
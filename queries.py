@@ -0,0 +1,201 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    query TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'open',  -- 'open' or 'resolved'
+    submitted_at REAL NOT NULL,
+    resolved_at REAL
+);
+CREATE INDEX IF NOT EXISTS queries_open ON queries (status, id);
+CREATE INDEX IF NOT EXISTS queries_resolved ON queries (status, resolved_at, id);
+"""
+
+OPEN = "open"
+RESOLVED = "resolved"
+
+# Largest page the admin views can ask for
+MAX_PAGE_SIZE = 200
+
+# PRAGMA user_version once completed_queries.csv has been imported
+LEGACY_IMPORTED = 1
+
+
+def to_display_time(timestamp: Optional[float]) -> Optional[str]:
+    """Local time in the format completed_queries.csv used."""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class QueryStore:
+    """
+    Durable SQLite queue of the queries users submit from the homepage.
+
+    Submissions are buffered and written in one transaction per batch when
+    ``flush`` is called: by the caller once ``submit`` reports a full batch of
+    ``batch_size``, and by the server every second. Reads flush first, so a worker always sees its own writes.
+    Resolving a query is a single-row update by ID. Open queries are listed oldest
+    first and resolved ones newest first, a page at a time with keyset cursors, so
+    the cost of a page does not grow with the number of queries stored. The
+    database is in WAL mode, so several server processes can share it.
+    """
+
+    def __init__(self, db_file: str, batch_size: int = 100, legacy_csv: Optional[str] = None):
+        """
+        :param db_file: Path to the SQLite database, created if it does not exist.
+        :param batch_size: Pending submissions after which ``submit`` reports a full batch.
+        :param legacy_csv: completed_queries.csv of earlier versions, imported as resolved
+                           queries into a new database.
+        """
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.pending: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_file, timeout=10, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        if legacy_csv:
+            self.import_legacy_csv(legacy_csv)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+    def import_legacy_csv(self, csv_file: str) -> int:
+        """
+        Imports completed_queries.csv into a new database, once: when several workers
+        open the database at the same time only the first one imports it. Returns the
+        number of queries imported.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")  # Held until the import is marked done
+            try:
+                imported = 0
+                if self._connection.execute("PRAGMA user_version").fetchone()[0] < LEGACY_IMPORTED:
+                    # A database of an earlier version that already has queries had it imported on creation
+                    empty = self._connection.execute("SELECT NOT EXISTS (SELECT 1 FROM queries)").fetchone()[0]
+                    if empty and os.path.exists(csv_file):
+                        rows = self.read_csv(csv_file)
+                        self._connection.executemany(
+                            "INSERT INTO queries (query, status, submitted_at, resolved_at) VALUES (?, ?, ?, ?)", rows)
+                        imported = len(rows)
+                    self._connection.execute(f"PRAGMA user_version = {LEGACY_IMPORTED}")
+                self._connection.commit()
+            except BaseException:
+                self._connection.rollback()
+                raise
+        return imported
+
+    @staticmethod
+    def read_csv(csv_file: str) -> List[Tuple[str, str, float, float]]:
+        """The (query, "%Y-%m-%d %H:%M:%S") rows of a completed_queries.csv as resolved query rows."""
+        rows = []
+        with open(csv_file, 'r', newline='', encoding='utf-8') as file:
+            for row in csv.reader(file):
+                if len(row) < 2:
+                    continue
+                try:
+                    resolved_at = datetime.strptime(row[1], "%Y-%m-%d %H:%M:%S").timestamp()
+                except ValueError:
+                    continue
+                rows.append((row[0], RESOLVED, resolved_at, resolved_at))
+        return rows
+
+    def submit(self, query: str, submitted_at: Optional[float] = None) -> bool:
+        """
+        Queues a new open query; it is written with the next batch. Returns True once
+        ``batch_size`` queries are pending, for the caller to ``flush`` them.
+        """
+        submitted_at = time.time() if submitted_at is None else submitted_at
+        with self._lock:
+            self.pending.append((query, submitted_at))
+            return len(self.pending) >= self.batch_size
+
+    def flush(self) -> int:
+        """Writes the pending submissions in one transaction. Returns how many were written."""
+        with self._lock:
+            if not self.pending:
+                return 0
+            pending, self.pending = self.pending, []
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT INTO queries (query, submitted_at) VALUES (?, ?)", pending)
+        return len(pending)
+
+    def resolve(self, query_id: int, resolved_at: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Marks an open query as resolved. Returns it, or None if there is no such open query."""
+        resolved_at = time.time() if resolved_at is None else resolved_at
+        self.flush()
+        with self._lock, self._connection:
+            updated = self._connection.execute(
+                "UPDATE queries SET status = ?, resolved_at = ? WHERE id = ? AND status = ?",
+                (RESOLVED, resolved_at, query_id, OPEN)).rowcount
+            if not updated:
+                return None
+            row = self._connection.execute(
+                "SELECT id, query, status, submitted_at, resolved_at FROM queries WHERE id = ?",
+                (query_id,)).fetchone()
+        return self.to_dict(row)
+
+    @staticmethod
+    def to_dict(row: Tuple) -> Dict[str, Any]:
+        query_id, query, status, submitted_at, resolved_at = row
+        return {
+            "id": query_id,
+            "query": query,
+            "status": status,
+            "submitted_at": to_display_time(submitted_at),
+            "resolved_at": to_display_time(resolved_at),
+        }
+
+    def counts(self) -> Dict[str, int]:
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute("SELECT status, COUNT(*) FROM queries GROUP BY status").fetchall()
+        return {OPEN: 0, RESOLVED: 0, **dict(rows)}
+
+    def open_page(self, after: Optional[int] = None, limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Open queries, oldest first, starting after the query with ID ``after``.
+        Returns the page and the cursor of the next one (None on the last page).
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, query, status, submitted_at, resolved_at FROM queries "
+                "WHERE status = ? AND id > ? ORDER BY id LIMIT ?", (OPEN, after or 0, limit + 1)).fetchall()
+        return self.page(rows, limit)
+
+    def resolved_page(self, before: Optional[int] = None,
+                      limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Resolved queries, most recently resolved first, starting after the query with
+        ID ``before`` in that order. Returns the page and the cursor of the next one.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        self.flush()
+        with self._lock:
+            if before is None:
+                rows = self._connection.execute(
+                    "SELECT id, query, status, submitted_at, resolved_at FROM queries "
+                    "WHERE status = ? ORDER BY resolved_at DESC, id DESC LIMIT ?", (RESOLVED, limit + 1)).fetchall()
+            else:
+                rows = self._connection.execute(
+                    "SELECT id, query, status, submitted_at, resolved_at FROM queries "
+                    "WHERE status = ? AND (resolved_at, id) < (SELECT resolved_at, id FROM queries WHERE id = ?) "
+                    "ORDER BY resolved_at DESC, id DESC LIMIT ?", (RESOLVED, before, limit + 1)).fetchall()
+        return self.page(rows, limit)
+
+    def page(self, rows: List[Tuple], limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        items = [self.to_dict(row) for row in rows[:limit]]
+        return items, items[-1]["id"] if len(rows) > limit else None
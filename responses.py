@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import json
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, List
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """Returns the content codings named in an Accept-Encoding header, skipping q=0 ones."""
+    encodings: List[str] = []
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q=') and params[2:] in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if coding:
+            encodings.append(coding.lower())
+    return encodings
+
+
+class EncodedBody:
+    """
+    A JSON payload serialized once, with gzip and (when available) brotli variants
+    and the validators needed for conditional requests.
+
+    Build one per data snapshot and answer every request from it, so serving the
+    payload costs no serialization or compression work.
+    """
+
+    def __init__(self, payload: Any, last_modified: float):
+        """
+        :param payload: JSON-serializable content.
+        :param last_modified: Unix time the content last changed.
+        """
+        # Same serialization settings as starlette.responses.JSONResponse
+        self.body: bytes = json.dumps(
+            payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+        self.variants: Dict[str, bytes] = {"gzip": gzip.compress(self.body, GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+
+        # Each representation gets its own strong ETag, as the content coding changes the bytes
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etags: Dict[str, str] = {"identity": f'"{digest}"'}
+        self.etags.update({coding: f'"{digest}-{coding}"' for coding in self.variants})
+
+        self.last_modified_ts: int = int(last_modified)
+        self.last_modified: str = formatdate(self.last_modified_ts, usegmt=True)
+
+    def is_not_modified(self, request: Request) -> bool:
+        """Evaluates If-None-Match, falling back to If-Modified-Since when it is absent."""
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            if if_none_match.strip() == '*':
+                return True
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            return not tags.isdisjoint(self.etags.values())
+
+        if_modified_since = request.headers.get('if-modified-since')
+        if if_modified_since:
+            try:
+                return self.last_modified_ts <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def choose_encoding(self, request: Request) -> str:
+        """Picks the best available content coding the client accepts."""
+        accepted = accepted_encodings(request.headers.get('accept-encoding', ''))
+        for coding in ("br", "gzip"):
+            if coding in self.variants and coding in accepted:
+                return coding
+        return "identity"
+
+    def response(self, request: Request) -> Response:
+        """Returns a 304 or the cached body in the client's preferred encoding."""
+        coding = self.choose_encoding(request)
+        headers = {
+            "ETag": self.etags[coding],
+            "Last-Modified": self.last_modified,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if self.is_not_modified(request):
+            return Response(status_code=304, headers=headers)
+
+        if coding == "identity":
+            return Response(self.body, media_type="application/json", headers=headers)
+        headers["Content-Encoding"] = coding
+        return Response(self.variants[coding], media_type="application/json", headers=headers)
+
@@ -0,0 +1,192 @@
+import csv
+import hashlib
+import os
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from metrics import ROSTER_REJECTS, ROSTER_STUDENTS
+
+# Column of the roster CSVs holding each student's public profile URL
+PROFILE_URL_COLUMN = "Google Cloud Skills Boost Profile URL"
+
+# Path of a public profile; the ID is a UUID on Google Cloud Skills Boost
+PROFILE_PATH_PATTERN = re.compile(r"^/public_profiles/([A-Za-z0-9_-]+)/?$")
+
+# Rejected rows printed when a roster is read; all of them are kept on RosterFile.rejects
+REJECTS_PRINTED = 10
+
+# Bytes read at a time when hashing a roster
+HASH_CHUNK_SIZE = 1 << 20
+
+
+class RosterEntry(NamedTuple):
+    """A student on a roster, with the profile URL in canonical form."""
+    profile_id: str
+    profile_url: str
+    line: int
+
+
+class RosterReject(NamedTuple):
+    """A roster row that was skipped, and why."""
+    line: int
+    value: str
+    reason: str
+
+
+class RosterDiff(NamedTuple):
+    """How a roster changed since it was last read."""
+    added: List[str]
+    removed: List[str]
+    changed: List[str]  # Same student, different profile URL
+
+
+def normalize_profile_url(profile_url: str) -> Tuple[str, str]:
+    """
+    Returns (profile ID, canonical profile URL) for a public profile URL: surrounding
+    whitespace, the query string, the fragment and a trailing slash are dropped and
+    the host is lowercased. Raises ValueError if it is not a public profile URL.
+    """
+    value = profile_url.strip()
+    if not value:
+        raise ValueError("missing profile URL")
+    try:
+        parts = urlsplit(value)
+    except ValueError as e:
+        raise ValueError("unparseable URL") from e
+    if parts.scheme.lower() not in ("http", "https") or not parts.netloc:
+        raise ValueError("not an http(s) URL")
+    match = PROFILE_PATH_PATTERN.match(parts.path)
+    if match is None:
+        raise ValueError("not a public profile URL")
+    profile_id = match.group(1)
+    return profile_id, f"{parts.scheme.lower()}://{parts.netloc.lower()}/public_profiles/{profile_id}"
+
+
+def iter_roster(csv_file: str, rejects: Optional[List[RosterReject]] = None) -> Iterator[RosterEntry]:
+    """
+    Streams the students of a roster CSV in file order, one row at a time, so a
+    large roster is never held in memory. Rows without a valid profile URL, and
+    students already listed on an earlier row, are skipped and appended to
+    ``rejects`` if given.
+
+    :param csv_file: Path to the roster CSV.
+    :param rejects: List to collect the skipped rows in.
+    """
+    rejects = rejects if rejects is not None else []
+    seen: Dict[str, int] = {}
+    with open(csv_file, mode='r', newline='', encoding='utf-8-sig') as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        if PROFILE_URL_COLUMN not in header:
+            rejects.append(RosterReject(reader.line_num, "", f"no '{PROFILE_URL_COLUMN}' column"))
+            return
+        column = header.index(PROFILE_URL_COLUMN)
+
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue  # Blank line
+            value = row[column] if column < len(row) else ""
+            try:
+                profile_id, profile_url = normalize_profile_url(value)
+            except ValueError as e:
+                rejects.append(RosterReject(reader.line_num, value, str(e)))
+                continue
+            if profile_id in seen:
+                rejects.append(RosterReject(reader.line_num, value, f"duplicate of line {seen[profile_id]}"))
+                continue
+            seen[profile_id] = reader.line_num
+            yield RosterEntry(profile_id, profile_url, reader.line_num)
+
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RosterFile:
+    """
+    One roster CSV, read again only when it changed.
+
+    ``refresh`` compares the file's size and modification time with the last read;
+    if they differ the file is hashed, and only if its content changed is it parsed
+    again and diffed against the previous roster. Refreshing an unchanged roster on
+    every refresh cycle therefore costs one ``stat`` call.
+
+    A roster that is missing or cannot be read, e.g. while it is being copied over,
+    is reported and the last good one is kept, so its students are not dropped.
+    """
+
+    def __init__(self, csv_file: str):
+        """
+        :param csv_file: Path to the roster CSV.
+        """
+        self.csv_file = csv_file
+        # Profile ID -> canonical profile URL, in file order
+        self.entries: Dict[str, str] = {}
+        self.rejects: List[RosterReject] = []
+        self.loaded = False
+        # Why the file could not be read last time, so the error is reported once
+        self.error: Optional[str] = None
+        self._stat: Optional[Tuple[int, int]] = None
+        self._digest: Optional[str] = None
+
+    def refresh(self) -> Optional[RosterDiff]:
+        """Reads the roster if it changed. Returns how it changed, or None if it did not."""
+        try:
+            stat = os.stat(self.csv_file)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self.loaded and signature == self._stat:
+                self.error = None
+                return None
+            digest = file_digest(self.csv_file)
+            if self.loaded and digest == self._digest:
+                self._stat = signature  # Touched, but the same content
+                self.error = None
+                return None
+            rejects: List[RosterReject] = []
+            entries = {entry.profile_id: entry.profile_url for entry in iter_roster(self.csv_file, rejects)}
+        except FileNotFoundError:
+            return self.failed("Roster not found")
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            return self.failed(f"Cannot read roster ({type(e).__name__}: {e})")
+
+        self.error = None
+        if rejects:
+            print(f"Skipped {len(rejects)} rows of {self.csv_file}:")
+            for reject in rejects[:REJECTS_PRINTED]:
+                print(f"  line {reject.line}: {reject.reason}: {reject.value!r}")
+        return self.replace(entries, rejects, signature, digest)
+
+    def failed(self, error: str) -> None:
+        """Reports a roster that could not be read. The last good roster stays in place."""
+        if error != self.error:
+            kept = f", keeping the last {len(self.entries)} students" if self.loaded else ""
+            print(f"{error}: {self.csv_file}{kept}")
+            self.error = error
+        return None
+
+    def replace(self, entries: Dict[str, str], rejects: List[RosterReject],
+                signature: Optional[Tuple[int, int]], digest: Optional[str]) -> RosterDiff:
+        old = self.entries
+        diff = RosterDiff(
+            added=[profile_id for profile_id in entries if profile_id not in old],
+            removed=[profile_id for profile_id in old if profile_id not in entries],
+            changed=[profile_id for profile_id, profile_url in entries.items()
+                     if profile_id in old and old[profile_id] != profile_url],
+        )
+        self.entries = entries
+        self.rejects = rejects
+        self.loaded = True
+        self._stat = signature
+        self._digest = digest
+        ROSTER_STUDENTS.set(len(entries), roster=self.csv_file)
+        ROSTER_REJECTS.set(len(rejects), roster=self.csv_file)
+        return diff
@@ -0,0 +1,159 @@
+import heapq
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass
+class ScheduleEntry:
+    """Refresh state of one profile."""
+    profile_id: str
+    next_refresh: float = 0.0
+    interval: float = 0.0
+    badge_count: Optional[int] = None
+    last_change: Optional[float] = None  # When the badge count last changed
+    failures: int = 0
+    version: int = 0  # Bumped on every reschedule; older heap items are ignored
+
+
+class RefreshScheduler:
+    """
+    Priority queue of profiles ordered by when each should be refreshed next.
+
+    The refresh interval of a profile grows with the time since its badge count
+    last changed: a student who just earned a badge is checked again after
+    ``min_interval``, one who has been idle for a week only every
+    ``max_interval``. Failed fetches back off exponentially. An admin can move a
+    profile to the front of the queue with ``request``.
+    """
+
+    def __init__(self, min_interval: float = 60.0, max_interval: float = 6 * 3600.0,
+                 activity_factor: float = 0.05, max_backoff: float = 6 * 3600.0, jitter: float = 0.1):
+        """
+        :param min_interval: Seconds between refreshes of the most active profiles.
+        :param max_interval: Upper bound on the seconds between refreshes of idle profiles.
+        :param activity_factor: Interval as a fraction of the time since the badge count last changed.
+        :param max_backoff: Upper bound on the retry delay after repeated failures.
+        :param jitter: Random spread applied to every delay, as a fraction, so refreshes do not bunch up.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.activity_factor = activity_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.entries: Dict[str, ScheduleEntry] = {}
+        self._heap: List[Tuple[float, int, int, str]] = []
+        self._counter = 0  # Tie-breaker keeping the heap order stable
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, profile_id: str) -> bool:
+        return profile_id in self.entries
+
+    def _push(self, entry: ScheduleEntry, at: float) -> None:
+        entry.version += 1
+        entry.next_refresh = at
+        self._counter += 1
+        heapq.heappush(self._heap, (at, self._counter, entry.version, entry.profile_id))
+
+    def _spread(self, delay: float) -> float:
+        return delay * (1.0 + random.uniform(-self.jitter, self.jitter)) if self.jitter else delay
+
+    def interval_for(self, entry: ScheduleEntry, now: float) -> float:
+        """Seconds until the next refresh of a profile that was fetched successfully at ``now``."""
+        if entry.last_change is None:
+            return self.min_interval
+        idle = max(0.0, now - entry.last_change)
+        return min(self.max_interval, max(self.min_interval, idle * self.activity_factor))
+
+    def sync(self, profile_ids: Iterable[str], now: Optional[float] = None) -> None:
+        """Adds profiles that joined the roster, due right away, and forgets those that left it."""
+        now = time.time() if now is None else now
+        roster = set(profile_ids)
+        for profile_id in roster.difference(self.entries):
+            entry = self.entries[profile_id] = ScheduleEntry(profile_id)
+            self._push(entry, now)
+        for profile_id in [profile_id for profile_id in self.entries if profile_id not in roster]:
+            del self.entries[profile_id]  # Its heap items are skipped when they come up
+
+    def seed(self, profile_id: str, badge_count: int, last_change: Optional[float],
+             refreshed_at: float) -> None:
+        """
+        Schedules a profile loaded from disk, as if it had last been refreshed at
+        ``refreshed_at`` and its badge count had last changed at ``last_change``.
+        """
+        entry = self.entries.setdefault(profile_id, ScheduleEntry(profile_id))
+        entry.badge_count = badge_count
+        entry.last_change = last_change if last_change is not None else refreshed_at
+        entry.interval = self.interval_for(entry, refreshed_at)
+        self._push(entry, refreshed_at + self._spread(entry.interval))
+
+    def record(self, profile_id: str, ok: bool, badge_count: int = 0, now: Optional[float] = None) -> None:
+        """Reschedules a profile after a refresh attempt."""
+        entry = self.entries.get(profile_id)
+        if entry is None:
+            return
+        now = time.time() if now is None else now
+        if not ok:
+            entry.failures += 1
+            delay = min(self.max_backoff, self.min_interval * 2 ** entry.failures)
+        else:
+            entry.failures = 0
+            if badge_count != entry.badge_count:
+                # A profile seen for the first time counts as just changed
+                entry.last_change = now
+                entry.badge_count = badge_count
+            entry.interval = delay = self.interval_for(entry, now)
+        self._push(entry, now + self._spread(delay))
+
+    def request(self, profile_id: str) -> bool:
+        """Moves a profile to the front of the queue. Returns False if it is not on the roster."""
+        entry = self.entries.get(profile_id)
+        if entry is None:
+            return False
+        self._push(entry, 0.0)
+        return True
+
+    def _discard_stale(self) -> None:
+        while self._heap:
+            _, _, version, profile_id = self._heap[0]
+            entry = self.entries.get(profile_id)
+            if entry is not None and entry.version == version:
+                return
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        """Time at which the next profile is due, or None if the queue is empty."""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """
+        Takes up to ``limit`` profiles that are due at ``now`` off the queue, most
+        overdue first. Each must be passed back to ``record`` to be scheduled again.
+        """
+        now = time.time() if now is None else now
+        profile_ids: List[str] = []
+        while limit is None or len(profile_ids) < limit:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            _, _, _, profile_id = heapq.heappop(self._heap)
+            profile_ids.append(profile_id)
+        return profile_ids
+
+    def status(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Schedule details of one profile, for the admin API."""
+        entry = self.entries.get(profile_id)
+        if entry is None:
+            return None
+        return {
+            "profile_id": profile_id,
+            "next_refresh": entry.next_refresh,
+            "interval": entry.interval,
+            "badge_count": entry.badge_count,
+            "last_change": entry.last_change,
+            "failures": entry.failures,
+        }
@@ -1,8 +1,111 @@
 import requests
 import re
 import html
-from typing import List, Dict, Optional
+from typing import Dict, Optional
 import json
+from models import Badge, GeneralStats, Profile, parse_earned_date, parse_points
+
+# Patterns for the individual profile fields. They are compiled once at import
+# time; the per-field getters on Scraper use them directly.
+USERNAME_PATTERN = re.compile(r"<title>([^|]+)\s*\|\s*Google Cloud Skills Boost</title>")
+LEAGUE_PATTERN = re.compile(r"<h2 class='ql-headline-medium'>(.*?)</h2>")
+MEMBER_SINCE_PATTERN = re.compile(r"<p class='ql-body-large l-mbl'>\s*Member since (\d{4})\s*</p>")
+EARNED_POINTS_PATTERN = re.compile(r"<strong>(\d+ points)</strong>")
+PROFILE_IMAGE_PATTERN = re.compile(r"<ql-avatar class='profile-avatar l-mbl' size='\d+' src='([^']+)'></ql-avatar>")
+
+# The field patterns plus the badge and "Earned ..." date markup, folded into
+# one alternation so a profile is parsed in a single left-to-right pass. Every
+# branch shares the leading "<", which keeps it as a literal prefix the regex
+# engine can scan for instead of trying each branch at every character.
+PROFILE_TOKEN_PATTERN = re.compile(
+    r"<(?:"
+    r"title>(?P<username>[^|]+)\s*\|\s*Google Cloud Skills Boost</title>"
+    r"|h2 class='ql-headline-medium'>(?P<league>.*?)</h2>"
+    r"|p class='ql-body-large l-mbl'>\s*Member since (?P<member_since>\d{4})\s*</p>"
+    r"|strong>(?P<earned_points>\d+ points)</strong>"
+    r"|ql-avatar class='profile-avatar l-mbl' size='\d+' src='(?P<profile_image>[^']+)'></ql-avatar>"
+    r"|div class='profile-badge'>\s*"
+    r"<a class=\"badge-image\" href=\"[^\"]*\">"
+    r"<img alt=\"Badge for (?P<badge_name>[^\"]*)\" src=\"(?P<badge_image>[^\"]*)\"\s*[^>]*>\s*</a>"
+    r"<span class='ql-title-medium\s+l-mts'>\s*.*?\s*</span>"
+    r"(?:\s*<span class='ql-body-medium\s+l-mbs'>\s*(?P<badge_date>Earned [^\<]*)\s*</span>)?"
+    r"|span class='ql-body-medium\s+l-mbs'>\s*(?P<earned_date>Earned [^\<]*)\s*</span>"
+    r")"
+)
+
+# Defaults used when a field is missing from the page
+FIELD_DEFAULTS: Dict[str, str] = {
+    "username": "Unknown",
+    "league": "Unknown",
+    "member_since": "Unknown",
+    "earned_points": "0 points",
+    "profile_image": "No Image",
+}
+
+
+def unescape(text: str) -> str:
+    """html.unescape, skipping the call for the common case of no entities."""
+    return html.unescape(text) if "&" in text else text
+
+
+def parse_profile_record(html_content: str, profile_id: str = "") -> Profile:
+    """
+    Parses a profile page in a single pass into a Profile record.
+
+    Each badge is paired with the first "Earned ..." date that follows it in the
+    document, so a badge with a missing date cannot shift the dates of the
+    badges after it.
+    """
+    fields: Dict[str, str] = {}
+    badges: Dict[str, Badge] = {}
+    pending_badge: Optional[Badge] = None
+
+    for match in PROFILE_TOKEN_PATTERN.finditer(html_content):
+        kind = match.lastgroup
+        if kind == "earned_date":
+            if pending_badge is not None:
+                pending_badge.earned_date = match.group("earned_date").strip()
+                pending_badge.earned_on = parse_earned_date(pending_badge.earned_date)
+                pending_badge = None
+        elif kind == "badge_image" or kind == "badge_date":
+            badge_name, badge_image, earned_date = match.group("badge_name", "badge_image", "badge_date")
+            badge = Badge.create(unescape(badge_name.strip()), unescape(badge_image.strip()),
+                                 earned_date.strip() if earned_date is not None else "Unknown")
+            badges[badge.title] = badge
+            # A date right after the badge markup was already matched with it
+            pending_badge = badge if earned_date is None else None
+        elif kind not in fields:
+            # Only the first occurrence of a single-valued field counts
+            fields[kind] = match.group(kind).strip()
+
+    return Profile(
+        profile_id=profile_id,
+        profile_name=fields.get("username", FIELD_DEFAULTS["username"]),
+        general=GeneralStats(
+            league=fields.get("league", FIELD_DEFAULTS["league"]),
+            member_since=fields.get("member_since", FIELD_DEFAULTS["member_since"]),
+            earned_points=parse_points(fields.get("earned_points", FIELD_DEFAULTS["earned_points"])),
+            profile_image=fields.get("profile_image", FIELD_DEFAULTS["profile_image"]),
+        ),
+        badges=badges,
+    )
+
+
+def parse_profile(html_content: str) -> Dict[str, Optional[dict]]:
+    """Parses a profile page and returns the same structure as Scraper.compile_profile_info."""
+    record = parse_profile_record(html_content)
+    return {
+        "profile_name": record.profile_name,
+        "general": {
+            "league": record.general.league,
+            "member_since": record.general.member_since,
+            "earned_points": f"{record.general.earned_points} points",
+            "profile_image": record.general.profile_image,
+            "number_of_badges_earned": record.number_of_badges
+        },
+        "badges": {title: badge.to_dict() for title, badge in record.badges.items()}
+    }
+
 
 class Scraper:
     def __init__(self, url: str) -> None:
@@ -15,9 +118,13 @@ class Scraper:
         self.url: str = url
         self.html_content: str = ""
 
-    def fetch_page(self) -> None:
+    def fetch_page(self, timeout: float = 15.0) -> None:
         """Fetches the profile page and stores the HTML content."""
-        response: requests.Response = requests.get(self.url)
+        try:
+            response: requests.Response = requests.get(self.url, timeout=timeout)
+        except requests.RequestException as e:
+            print(f"Failed to retrieve the page: {e!r}")
+            return
         if response.status_code == 200:
             self.html_content = response.text
         else:
@@ -25,81 +132,44 @@ class Scraper:
 
     def get_username(self) -> str:
         """Extracts the username from the HTML content."""
-        pattern: str = r"<title>([^|]+)\s*\|\s*Google Cloud Skills Boost</title>"
-        match: List[str] = re.findall(pattern, self.html_content)
-        return match[0].strip() if match else "Unknown"
+        match: Optional[re.Match] = USERNAME_PATTERN.search(self.html_content)
+        return match.group(1).strip() if match else "Unknown"
 
     def get_league(self) -> str:
         """Extracts the league from the HTML content."""
-        pattern: str = r"<h2 class='ql-headline-medium'>(.*?)</h2>"
-        match: List[str] = re.findall(pattern, self.html_content)
-        return match[0].strip() if match else "Unknown"
+        match: Optional[re.Match] = LEAGUE_PATTERN.search(self.html_content)
+        return match.group(1).strip() if match else "Unknown"
 
     def get_member_since(self) -> str:
         """Extracts the member since date from the HTML content."""
-        pattern: str = r"<p class='ql-body-large l-mbl'>\s*Member since (\d{4})\s*</p>"
-        match: List[str] = re.findall(pattern, self.html_content)
-        return match[0].strip() if match else "Unknown"
+        match: Optional[re.Match] = MEMBER_SINCE_PATTERN.search(self.html_content)
+        return match.group(1).strip() if match else "Unknown"
 
     def get_earned_points(self) -> str:
         """Extracts the earned points from the HTML content."""
-        pattern: str = r"<strong>(\d+ points)</strong>"
-        match: List[str] = re.findall(pattern, self.html_content)
-        return match[0].strip() if match else "0 points"
+        match: Optional[re.Match] = EARNED_POINTS_PATTERN.search(self.html_content)
+        return match.group(1).strip() if match else "0 points"
 
     def get_profile_image(self) -> str:
         """Extracts the profile image URL from the HTML content."""
-        pattern: str = r"<ql-avatar class='profile-avatar l-mbl' size='\d+' src='([^']+)'></ql-avatar>"
-        match: List[str] = re.findall(pattern, self.html_content)
-        return match[0].strip() if match else "No Image"
+        match: Optional[re.Match] = PROFILE_IMAGE_PATTERN.search(self.html_content)
+        return match.group(1).strip() if match else "No Image"
 
     def get_badges(self) -> Dict[str, Dict[str, str]]:
         """Extracts badge names, their corresponding completion dates, and images."""
-        badge_pattern: str = (
-            r"<div class='profile-badge'>\s*"
-            r"<a class=\"badge-image\" href=\"[^\"]*\">"
-            r"<img alt=\"Badge for ([^\"]*)\" src=\"([^\"]*)\"\s*[^>]*>\s*</a>"
-            r"<span class='ql-title-medium\s+l-mts'>\s*(.*?)\s*</span>"
-        )
-        date_pattern: str = r"<span class='ql-body-medium\s+l-mbs'>\s*(Earned [^\<]*)\s*</span>"
-
-        badge_matches: List[tuple] = re.findall(badge_pattern, self.html_content)
-        date_matches: List[str] = re.findall(date_pattern, self.html_content)
-
-        badge_dict: Dict[str, Dict[str, str]] = {}
-
-        # Extract badges and their details
-        for (badge_name, badge_image, _), date in zip(badge_matches, date_matches):
-            badge_name = html.unescape(badge_name.strip())
-            badge_image = html.unescape(badge_image.strip())
-            badge_dict[badge_name] = {
-                "badge_image": badge_image,
-                "earned_date": date.strip()
-            }
-
-        # Add the number of badges earned
-        number_of_badges_earned: int = len(badge_dict)
-        
+        badges: Dict[str, Dict[str, str]] = parse_profile(self.html_content)["badges"]
         return {
-            "badges": badge_dict,
-            "number_of_badges_earned": number_of_badges_earned
+            "badges": badges,
+            "number_of_badges_earned": len(badges)
         }
 
     def compile_profile_info(self) -> Dict[str, Optional[dict]]:
         """Compiles all profile information into a structured dictionary."""
-        badges_info = self.get_badges()  
-        profile_data: Dict[str, Optional[dict]] = {
-            "profile_name": self.get_username(),
-            "general": {
-                "league": self.get_league(),
-                "member_since": self.get_member_since(),
-                "earned_points": self.get_earned_points(),
-                "profile_image": self.get_profile_image(),
-                "number_of_badges_earned": badges_info["number_of_badges_earned"]  # Include badge count here
-            },
-            "badges": badges_info["badges"]  
-        }
-        return profile_data
+        return parse_profile(self.html_content)
+
+    def compile_profile_record(self, profile_id: str = "") -> Profile:
+        """Compiles all profile information into a Profile record."""
+        return parse_profile_record(self.html_content, profile_id)
 
     def save_to_json(self, data: Dict[str, Optional[dict]]) -> None:
         """Saves the profile data to a JSON file."""
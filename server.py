@@ -1,20 +1,31 @@
 import asyncio
-import csv
-import json
+import functools
 import logging
 import os
-from datetime import datetime
-from typing import Any, Dict
+import time
+from datetime import date, datetime, timezone
+from typing import Optional
 
 import uvicorn
 from starlette.applications import Starlette
 from starlette.middleware.sessions import SessionMiddleware
-from starlette.responses import JSONResponse, RedirectResponse
+from starlette.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
 from starlette.routing import Route
 from starlette.staticfiles import StaticFiles
 from starlette.templating import Jinja2Templates
 
+from cohorts import Cohort, CohortConfig, CohortRegistry, load_cohort_configs
+from coordination import LeaderLock, WorkerState
 from getData import DataFetcher  # Adjust import according to your project structure
+from history import HistoryStore, to_isoformat, to_timestamp
+from leaderboard import DEFAULT_LIMIT, DEFAULT_SORT_KEY
+from metrics import (FAILING_PROFILES, PROFILES_SERVED, REFRESHER, REGISTRY, REQUEST_DURATION, SNAPSHOT_AGE,
+                     STALE_PROFILES, MetricsMiddleware)
+from models import diff_profiles
+from pipeline import ParsePool
+from profiling import SamplingProfiler
+from queries import QueryStore
+from scheduler import RefreshScheduler
 
 # Configure logging
 logging.basicConfig(
@@ -26,59 +37,241 @@ logging.basicConfig(
     ]
 )
 logger = logging.getLogger(__name__)
+# httpx logs every request of a refresh sweep at INFO level
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 # Setting up templates for rendering
 templates = Jinja2Templates(directory='templates')
 
-# Store queries in memory for simplicity
-queries: list[dict[str, str]] = []
-resolved_queries: list[dict[str, str]] = []
+# User queries, durable across restarts and shared by every worker
+QUERIES_DB = "queries.db"
+# Resolved queries of earlier versions, imported when the database is created
+COMPLETED_QUERIES_CSV = "completed_queries.csv"
+# Seconds between writes of the submitted queries batch
+QUERY_FLUSH_INTERVAL = 1.0
+# Queries per page of the admin dashboard
+QUERY_PAGE_SIZE = 50
+query_store: Optional[QueryStore] = None
+
+# Cohorts served by this instance, each a roster CSV with its badge catalog. Without
+# the registry file there is one cohort, from data/genai.csv and data/badges.json
+COHORTS_FILE = "data/cohorts.json"
+DEFAULT_COHORT = CohortConfig("genai", "data/genai.csv", "data/badges.json", "Gen AI Study Jam")
+# Most cohorts kept in memory at once, and seconds without requests after which one is unloaded
+MAX_LOADED_COHORTS = 4
+COHORT_IDLE_TIMEOUT = 3600
+COHORT_CHECK_INTERVAL = 60
+
+# Worker processes serving requests. Exactly one of them, elected through the lock
+# file, refreshes profiles; the others reload each snapshot it saves
+WORKERS = 1
+LEADER_LOCK_FILE = "refresher.lock"
+# Commands for the refresher, its schedule and the last profile report, shared by all workers
+WORKER_STATE_DB = "workers.db"
+# Seconds between a follower's checks for a new snapshot, between its attempts to take
+# over the lock, and between the refresher's checks for commands sent by other workers
+SNAPSHOT_POLL_INTERVAL = 1.0
+LEADER_RETRY_INTERVAL = 5.0
+COMMAND_POLL_INTERVAL = 1.0
 
 # Admin credentials
 ADMIN_EMAIL = "admin@gcsb.makaut.in"
 ADMIN_PASSWORD = "admin6969"
 
+# Fetch engine settings for the profile refresh sweep
+FETCH_CONCURRENCY = 16
+FETCH_REQUESTS_PER_SECOND = 25.0
+FETCH_TIMEOUT = 15.0
+# Extra attempts for a page that timed out, was rate limited or hit a server error
+FETCH_RETRIES = 3
+
+# Worker processes that parse fetched pages (None uses every CPU), and how many
+# fetched pages may wait for them before fetching pauses
+PARSE_WORKERS: Optional[int] = None
+PARSE_QUEUE_SIZE = 64
+
+# Refresh scheduling. A profile whose badge count just changed is refreshed again
+# after REFRESH_MIN_INTERVAL seconds; the longer it stays unchanged the less often
+# it is checked (REFRESH_ACTIVITY_FACTOR of its idle time), up to REFRESH_MAX_INTERVAL.
+REFRESH_MIN_INTERVAL = 60
+REFRESH_MAX_INTERVAL = 6 * 3600
+REFRESH_ACTIVITY_FACTOR = 0.05
+# Most profiles refreshed in one sweep, and the longest the scheduler sleeps
+# between checks (roster changes are picked up on the next check)
+REFRESH_BATCH_SIZE = 500
+SCHEDULER_MAX_SLEEP = 60
+
+# The fetcher is kept across sweeps so its change cache and merged profiles carry over.
+# It sweeps the rosters of all cohorts together, fetching each student once
+data_fetcher: Optional[DataFetcher] = None
+# When the fetcher's profiles were last published to the cohorts
+profiles_published_at = 0.0
+
+# Each cohort's profiles, analytics and stream clients, built from the fetcher's records
+# when first requested and updated with each sweep's changes while loaded
+cohort_configs = load_cohort_configs(COHORTS_FILE, DEFAULT_COHORT)
+cohort_registry = CohortRegistry(cohort_configs, lambda: (get_data_fetcher().profiles, profiles_published_at),
+                                 MAX_LOADED_COHORTS, COHORT_IDLE_TIMEOUT)
+
+# Decides which profiles are due for a refresh; the event wakes it for on-demand refreshes
+refresh_scheduler = RefreshScheduler(REFRESH_MIN_INTERVAL, REFRESH_MAX_INTERVAL, REFRESH_ACTIVITY_FACTOR)
+refresh_requested = asyncio.Event()
+# The fetcher's roster_version the scheduler was last synced with
+scheduled_roster_version = -1
+
+# Set by POST /admin/profile: the next refresh cycle is a full sweep run under the
+# sampling profiler, and its report is kept in the worker state for GET /admin/profile
+profile_next_refresh = False
+
+# Held by the worker that refreshes profiles
+leader_lock = LeaderLock(LEADER_LOCK_FILE)
+worker_state: Optional[WorkerState] = None
+
+# Gauges of the served data, computed when /metrics is scraped
+SNAPSHOT_AGE.set_function(lambda: time.time() - profiles_published_at if profiles_published_at else None)
+PROFILES_SERVED.set_function(lambda: {(cohort.name,): len(cohort.store.snapshot.profiles)
+                                      for cohort in list(cohort_registry.loaded.values())})
+STALE_PROFILES.set_function(lambda: sum(profile.stale for profile in data_fetcher.profiles.values())
+                            if data_fetcher is not None else 0)
+REFRESHER.set_function(lambda: int(leader_lock.held))
+FAILING_PROFILES.set_function(lambda: {(profile_id,): entry.failures
+                                       for profile_id, entry in refresh_scheduler.entries.items() if entry.failures})
+
+# Append-only log of per-profile changes, for progress-over-time queries
+HISTORY_DB = "profiles_history.db"
+history_store: Optional[HistoryStore] = None
+
+def get_history_store() -> HistoryStore:
+    global history_store
+    if history_store is None:
+        history_store = HistoryStore(HISTORY_DB)
+    return history_store
+
+def get_query_store() -> QueryStore:
+    global query_store
+    if query_store is None:
+        query_store = QueryStore(QUERIES_DB, legacy_csv=COMPLETED_QUERIES_CSV)
+    return query_store
+
+def get_worker_state() -> WorkerState:
+    global worker_state
+    if worker_state is None:
+        worker_state = WorkerState(WORKER_STATE_DB)
+    return worker_state
+
 # Check if the JSON file exists
 def json_file_exists(file_path: str) -> bool:
     return os.path.exists(file_path)
 
-async def run_get_data_script() -> None:
+def get_data_fetcher() -> DataFetcher:
+    global data_fetcher
+    if data_fetcher is None:
+        data_fetcher = DataFetcher([config.roster_file for config in cohort_configs], "profiles_data.json",
+                                   cohort_configs[0].badges_file,
+                                   FETCH_CONCURRENCY, FETCH_REQUESTS_PER_SECOND, FETCH_TIMEOUT,
+                                   parse_workers=PARSE_WORKERS, queue_size=PARSE_QUEUE_SIZE, retries=FETCH_RETRIES)
+    return data_fetcher
+
+def rosters_exist() -> bool:
+    return any(json_file_exists(config.roster_file) for config in cohort_configs)
+
+# Apply a sweep's changes to the loaded cohorts and push them to their stream clients
+async def publish_changes(changed: list) -> None:
+    for cohort, cohort_changes in await asyncio.to_thread(cohort_registry.update, changed):
+        cohort.broadcaster.publish(cohort_changes)
+
+async def run_get_data_script(profile_ids: Optional[list[str]] = None) -> bool:
+    global profiles_published_at
     logger.info("Attempting to scrape data...")
-    if json_file_exists("data/genai.csv"):
+    if rosters_exist():
         logger.info("Found CSV file. Fetching data...")
-        fetcher = DataFetcher("data/genai.csv", "profiles_data.json", "data/badges.json")
+        fetcher = get_data_fetcher()
         
         try:
             # Check and generate badges file
             fetcher.check_and_generate_badges_file()
-            fetcher.extract_profiles_to_json()
-            logger.info("Data fetching complete, profiles_data.json updated.")
+            changed = await fetcher.extract_profiles_to_json(profile_ids)
+
+            if changed:
+                await asyncio.to_thread(get_history_store().record, changed)
+
+            if changed or not profiles_published_at:
+                profiles_published_at = time.time()
+            # Also run without changes: a cohort rebuilds itself when its roster or catalog changed
+            await publish_changes(changed)
+            logger.info(f"Data fetching complete, {len(changed)} profiles changed.")
+            return True
         except Exception as e:
             logger.error(f"Error during data fetching: {e}")
     else:
         logger.error("CSV file not found. Cannot scrape data.")
-
-# Load data from the JSON file
-def load_data(file_path: str) -> Dict[str, Any]:
+    return False
+
+# Schedule the saved profiles by how recently each one earned a badge
+def seed_scheduler(fetcher: DataFetcher, refreshed_at: float) -> None:
+    for profile_id, profile in fetcher.profiles.items():
+        latest = max((badge.earned_on for badge in profile.badges.values() if badge.earned_on), default=None)
+        last_change = datetime(latest.year, latest.month, latest.day, tzinfo=timezone.utc).timestamp() if latest else None
+        refresh_scheduler.seed(profile_id, profile.number_of_badges, last_change, refreshed_at)
+
+# Run one full sweep under the sampling profiler and keep its report
+async def run_profiled_refresh() -> None:
+    global profile_next_refresh
+    profile_next_refresh = False
+    fetcher = get_data_fetcher()
+    # Parse in a thread of this process for this cycle, so the samples include parsing
+    parse_pool, fetcher.parse_pool = fetcher.parse_pool, ParsePool(0)
     try:
-        with open(file_path, 'r', encoding='utf-8') as json_file:
-            logger.info(f"Loading data from {file_path}")
-            return json.load(json_file)
-    except FileNotFoundError:
-        logger.error(f"File not found: {file_path}")
-        return {}
-    except json.JSONDecodeError:
-        logger.error(f"Error decoding JSON from {file_path}")
-        return {}
+        with SamplingProfiler() as profiler:
+            await run_get_data_script()
+    finally:
+        fetcher.parse_pool = parse_pool
+    report = profiler.report()
+    await asyncio.to_thread(get_worker_state().set, "profile_report", report)
+    logger.info(f"Refresh cycle profile:\n{report}")
+
+# Share the refresh schedule with the other workers, for GET /admin/refresh/{id}
+async def export_schedule() -> None:
+    statuses = [refresh_scheduler.status(profile_id) for profile_id in list(refresh_scheduler.entries)]
+    await asyncio.to_thread(get_worker_state().save_schedule, statuses)
+
+# Refresh the profiles that are due and schedule each of them again
+async def refresh_due_profiles() -> None:
+    global scheduled_roster_version
+    if not rosters_exist():
+        logger.error("CSV file not found. Cannot scrape data.")
+        return
+    if profile_next_refresh:
+        await run_profiled_refresh()
+    fetcher = get_data_fetcher()
+    roster = await asyncio.to_thread(fetcher.read_roster)
+    if fetcher.roster_version != scheduled_roster_version:
+        refresh_scheduler.sync(profile_id for profile_id, _ in roster)
+        scheduled_roster_version = fetcher.roster_version
+    due = refresh_scheduler.due(limit=REFRESH_BATCH_SIZE)
+    if not due:
+        return
+
+    logger.info(f"Refreshing {len(due)} of {len(refresh_scheduler)} profiles.")
+    ok = await run_get_data_script(due)
+    for profile_id in due:
+        profile = fetcher.profiles.get(profile_id)
+        refresh_scheduler.record(profile_id, ok and profile_id not in fetcher.failed,
+                                 profile.number_of_badges if profile else 0)
+    await export_schedule()
 
 # Serve the homepage with buttons and query submission form
 async def homepage(request):
     if request.method == 'POST':
         form = await request.form()
-        user_query = form.get('query')
-
-        # Save the query
-        queries.append({"query": user_query})
+        user_query = (form.get('query') or '').strip()
+        if not user_query:
+            return RedirectResponse("/", status_code=303)
+
+        # Queue the query; it is written with the next batch, or now if that is full
+        store = get_query_store()
+        if store.submit(user_query):
+            await asyncio.to_thread(store.flush)
         logger.info(f"New query submitted: {user_query}")
 
         # Simulate push notification
@@ -88,22 +281,34 @@ async def homepage(request):
 
     return templates.TemplateResponse('homepage.html', {"request": request})
 
-# Display all profiles
-async def profiles(request) -> JSONResponse:
-    data = load_data('profiles_data.json')
-    logger.info("Retrieved all profiles.")
-    return JSONResponse(data)
+# Per-cohort routes are served for the default cohort as they are, and for any cohort
+# under /cohorts/{cohort}. This resolves the cohort, loading it if needed, for the handler
+def cohort_endpoint(handler):
+    @functools.wraps(handler)
+    async def endpoint(request) -> Response:
+        name = request.path_params.get('cohort', cohort_registry.default)
+        cohort = cohort_registry.peek(name) or await asyncio.to_thread(cohort_registry.get, name)
+        if cohort is None:
+            logger.warning(f"Cohort not found: {name}")
+            return JSONResponse({"error": "Cohort not found"}, status_code=404)
+        return await handler(request, cohort)
+    return endpoint
+
+# List the configured cohorts
+async def cohorts(request) -> JSONResponse:
+    return JSONResponse({"cohorts": cohort_registry.summary()})
+
+# Display all profiles, from the body pre-serialized for the current snapshot
+@cohort_endpoint
+async def profiles(request, cohort: Cohort) -> Response:
+    logger.info(f"Retrieved all profiles of {cohort.name}.")
+    return cohort.store.snapshot.body.response(request)
 
 # Display a single profile by ID
-async def get_profile(request) -> JSONResponse:
+@cohort_endpoint
+async def get_profile(request, cohort: Cohort) -> JSONResponse:
     profile_id = request.path_params['id']
-    data = load_data('profiles_data.json')
-
-    profile = {}
-    for name, info in data.items():
-        if info['general']['profile_id'] == profile_id:
-            profile = {name: info}
-            break
+    profile = cohort.store.get_profile(profile_id)
 
     if profile:
         logger.info(f"Profile found for ID: {profile_id}")
@@ -112,6 +317,114 @@ async def get_profile(request) -> JSONResponse:
         logger.warning(f"Profile not found for ID: {profile_id}")
         return JSONResponse({"error": "Profile not found"}, status_code=404)
 
+# Live updates as Server-Sent Events: a snapshot, then only what changed. Optional
+# filters: ?id=<profile ID> for one profile, or ?top=N (&sort=...) for the leaderboard top N
+@cohort_endpoint
+async def profiles_stream(request, cohort: Cohort) -> Response:
+    params = request.query_params
+    broadcaster = cohort.broadcaster
+    try:
+        top = int(params['top']) if 'top' in params else None
+        subscription = broadcaster.subscribe(params.get('id'), top, params.get('sort', DEFAULT_SORT_KEY))
+    except ValueError as e:
+        logger.warning(f"Bad stream request: {e}")
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    logger.info(f"Stream opened for {cohort.name} ({len(broadcaster.subscribers)} connected).")
+    return StreamingResponse(
+        broadcaster.stream(subscription, request.headers.get('last-event-id')),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Ranked leaderboard, sliced from the rankings precomputed for the current snapshot
+@cohort_endpoint
+async def leaderboard(request, cohort: Cohort) -> JSONResponse:
+    params = request.query_params
+    try:
+        page = cohort.store.snapshot.leaderboard.query(
+            sort_key=params.get('sort', DEFAULT_SORT_KEY),
+            descending=params.get('order', 'desc') != 'asc',
+            filter_name=params.get('filter', 'all'),
+            limit=int(params.get('limit', DEFAULT_LIMIT)),
+            offset=int(params.get('offset', 0)),
+            cursor=params.get('cursor'),
+        )
+    except ValueError as e:
+        logger.warning(f"Bad leaderboard request: {e}")
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return JSONResponse(page)
+
+# Badge catalog with how many students have earned each badge
+@cohort_endpoint
+async def badges(request, cohort: Cohort) -> JSONResponse:
+    summary = cohort.analytics.summary()
+    return JSONResponse({"students": summary["students"], "badges": summary["badges"]})
+
+# Students who have not earned a given catalog badge yet
+@cohort_endpoint
+async def badge_missing(request, cohort: Cohort) -> JSONResponse:
+    badge_id = request.path_params['id']
+    snapshot = cohort.store.snapshot
+    if snapshot.catalog is None or badge_id not in snapshot.catalog.by_id:
+        return JSONResponse({"error": "Badge not found"}, status_code=404)
+
+    missing = snapshot.catalog.missing(snapshot.profiles.values(), badge_id)
+    return JSONResponse({
+        "badge_id": badge_id,
+        "missing": [{"profile_id": profile.profile_id, "profile_name": profile.profile_name} for profile in missing]
+    })
+
+# Per-badge completion rates and the students who finished every skill badge
+@cohort_endpoint
+async def analytics(request, cohort: Cohort) -> JSONResponse:
+    return JSONResponse(cohort.analytics.summary())
+
+# Badge completions per day, optionally for one badge and a date range
+@cohort_endpoint
+async def analytics_daily(request, cohort: Cohort) -> JSONResponse:
+    params = request.query_params
+    try:
+        since = date.fromisoformat(params['since']) if 'since' in params else None
+        until = date.fromisoformat(params['until']) if 'until' in params else None
+        badge_id = int(params['badge']) if 'badge' in params else None
+    except ValueError as e:
+        logger.warning(f"Bad analytics request: {e}")
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return JSONResponse({
+        "badge_id": badge_id,
+        "days": cohort.analytics.completions_per_day(since, until, badge_id)
+    })
+
+# Recorded changes of one profile on the cohort's roster over time
+@cohort_endpoint
+async def profile_history(request, cohort: Cohort) -> JSONResponse:
+    params = request.query_params
+    try:
+        since, until = to_timestamp(params.get('since')), to_timestamp(params.get('until'))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    profile_id = request.path_params['id']
+    if profile_id not in cohort.members:
+        logger.warning(f"Profile not found for ID: {profile_id}")
+        return JSONResponse({"error": "Profile not found"}, status_code=404)
+    events = await asyncio.to_thread(get_history_store().profile_timeline, profile_id, since, until)
+    return JSONResponse({"profile_id": profile_id, "events": events})
+
+# Cohort-wide progress over a time range, for the students currently on the roster
+@cohort_endpoint
+async def cohort_history(request, cohort: Cohort) -> JSONResponse:
+    params = request.query_params
+    try:
+        since, until = to_timestamp(params.get('since')), to_timestamp(params.get('until'))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return JSONResponse(await asyncio.to_thread(get_history_store().cohort_progress, since, until, cohort.members))
+
 # Login form handling
 async def admin_login(request):
     if request.method == 'POST':
@@ -127,51 +440,234 @@ async def admin_login(request):
 
     return templates.TemplateResponse('admin_login.html', {"request": request})
 
-# Function to save completed query to CSV
-def save_completed_query(query: str, timestamp: str) -> None:
-    with open('completed_queries.csv', mode='a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow([query, timestamp])
-
-# Admin dashboard with authentication check
+# Admin dashboard with authentication check. Open and resolved queries are paged
+# separately: ?open_after=<ID> and ?resolved_before=<ID> are the cursors
 async def admin_dashboard(request):
-    global resolved_queries
     if not request.session.get('is_admin'):
         return RedirectResponse('/admin/login')
 
+    store = get_query_store()
     if request.method == 'POST':
         form = await request.form()
         selected_query = form.get('selected_query')
-        if selected_query:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            save_completed_query(selected_query, timestamp)
-            logger.info(f"Query marked as completed: {selected_query} at {timestamp}")
+        if selected_query and selected_query.isdigit():
+            resolved = await asyncio.to_thread(store.resolve, int(selected_query))
+            if resolved:
+                logger.info(f"Query marked as completed: {resolved['query']} at {resolved['resolved_at']}")
 
-            # Move the selected query to resolved
-            resolved_queries.append({"query": selected_query, "timestamp": timestamp})
-            queries[:] = [query for query in queries if query['query'] != selected_query]
+        # Back to the pages the admin was looking at
+        query = request.url.query
+        return RedirectResponse('/admin/dashboard' + (f'?{query}' if query else ''), status_code=303)
 
-            return RedirectResponse('/admin/dashboard', status_code=303)
+    params = request.query_params
+    try:
+        open_after = int(params['open_after']) if 'open_after' in params else None
+        resolved_before = int(params['resolved_before']) if 'resolved_before' in params else None
+    except ValueError:
+        return JSONResponse({"error": "Page cursors must be query IDs"}, status_code=400)
 
+    queries, next_open = await asyncio.to_thread(store.open_page, open_after, QUERY_PAGE_SIZE)
+    resolved_queries, next_resolved = await asyncio.to_thread(store.resolved_page, resolved_before, QUERY_PAGE_SIZE)
     return templates.TemplateResponse('admin_dashboard.html', {
         "request": request,
         "queries": queries,
-        "resolved_queries": resolved_queries
+        "resolved_queries": resolved_queries,
+        "counts": await asyncio.to_thread(store.counts),
+        "next_open": next_open,
+        "next_resolved": next_resolved,
+        "open_after": open_after,
+        "resolved_before": resolved_before,
     })
 
-# Data fetching function to run every minute
-async def run_data_fetcher() -> None:
+# Admin: schedule details of a profile (GET) or queue it for an immediate refresh (POST)
+async def admin_refresh(request) -> JSONResponse:
+    if not request.session.get('is_admin'):
+        return JSONResponse({"error": "Not authorized"}, status_code=401)
+
+    profile_id = request.path_params['id']
+    if leader_lock.held:
+        if request.method == 'POST':
+            if not refresh_scheduler.request(profile_id):
+                logger.warning(f"Refresh requested for unknown profile ID: {profile_id}")
+                return JSONResponse({"error": "Profile not found"}, status_code=404)
+            refresh_requested.set()
+            logger.info(f"On-demand refresh queued for ID: {profile_id}")
+        status = refresh_scheduler.status(profile_id)
+    else:
+        # Another worker refreshes; answer from its shared schedule and pass the request on
+        status = await asyncio.to_thread(get_worker_state().schedule_status, profile_id)
+        if status is not None and request.method == 'POST':
+            await asyncio.to_thread(get_worker_state().send, "refresh", profile_id)
+            logger.info(f"On-demand refresh for ID {profile_id} sent to the refresher")
+
+    if status is None:
+        return JSONResponse({"error": "Profile not found"}, status_code=404)
+    for key in ("next_refresh", "last_change"):
+        if status[key] is not None:
+            status[key] = to_isoformat(status[key])
+    return JSONResponse(status, status_code=202 if request.method == 'POST' else 200)
+
+# Admin: arm the profiler for the next refresh cycle (POST) or read its last report (GET)
+async def admin_profile(request) -> Response:
+    global profile_next_refresh
+    if not request.session.get('is_admin'):
+        return JSONResponse({"error": "Not authorized"}, status_code=401)
+
+    if request.method == 'POST':
+        if leader_lock.held:
+            profile_next_refresh = True
+            refresh_requested.set()
+        else:
+            await asyncio.to_thread(get_worker_state().send, "profile")
+        logger.info("Profiling of the next refresh cycle requested")
+        return JSONResponse({"status": "the next refresh cycle will be profiled"}, status_code=202)
+    report = await asyncio.to_thread(get_worker_state().get, "profile_report")
+    return PlainTextResponse(report or "No refresh cycle has been profiled yet.")
+
+# Admin: the rows of a cohort's roster that were skipped as invalid or duplicate
+async def admin_roster(request) -> JSONResponse:
+    if not request.session.get('is_admin'):
+        return JSONResponse({"error": "Not authorized"}, status_code=401)
+
+    name = request.query_params.get('cohort', cohort_registry.default)
+    cohort = cohort_registry.peek(name) or await asyncio.to_thread(cohort_registry.get, name)
+    if cohort is None:
+        logger.warning(f"Cohort not found: {name}")
+        return JSONResponse({"error": "Cohort not found"}, status_code=404)
+    return JSONResponse({
+        "cohort": cohort.name,
+        "roster": cohort.config.roster_file,
+        "students": len(cohort.roster_ids),
+        "rejected": [reject._asdict() for reject in cohort.roster.rejects],
+    })
+
+# Metrics in the Prometheus text format
+async def metrics(request) -> Response:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Writes the submitted queries in batches
+async def flush_queries() -> None:
     while True:
-        await run_get_data_script()  # Always attempt to scrape data
-        await asyncio.sleep(120)  # Sleep for 2 minutes
+        await asyncio.sleep(QUERY_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(get_query_store().flush)
+        except Exception as e:
+            logger.error(f"Error writing queries: {e}")
 
-# Define routes
-routes = [
-    Route('/', homepage, methods=["GET", "POST"]),
+# Refresher: carries out the admin commands other workers pass on
+async def run_commands() -> None:
+    global profile_next_refresh
+    while True:
+        await asyncio.sleep(COMMAND_POLL_INTERVAL)
+        try:
+            commands = await asyncio.to_thread(get_worker_state().take_commands)
+        except Exception as e:
+            logger.error(f"Error reading worker commands: {e}")
+            continue
+        for command, argument in commands:
+            if command == "refresh":
+                refresh_scheduler.request(argument)
+            elif command == "profile":
+                profile_next_refresh = True
+        if commands:
+            refresh_requested.set()
+
+# Followers: serve the snapshot the refresher saved last
+async def reload_snapshot() -> None:
+    global profiles_published_at
+    fetcher = get_data_fetcher()
+    catalog = await asyncio.to_thread(fetcher.load_catalog)
+    profiles = await asyncio.to_thread(fetcher.read_profiles)
+    for profile in profiles.values():
+        catalog.apply(profile)
+    changed = diff_profiles(fetcher.profiles, profiles)
+    fetcher.profiles = profiles
+    profiles_published_at = os.path.getmtime(fetcher.json_file)
+    await publish_changes(changed)
+    logger.info(f"Reloaded the refresher's snapshot, {len(changed)} profiles changed.")
+
+def snapshot_signature(file_path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+# Followers: reload every snapshot the refresher saves, and take its place if it exits
+async def follow_refresher() -> None:
+    fetcher = get_data_fetcher()
+    signature = snapshot_signature(fetcher.json_file)
+    next_attempt = time.monotonic() + LEADER_RETRY_INTERVAL
+    while True:
+        await asyncio.sleep(SNAPSHOT_POLL_INTERVAL)
+        current = snapshot_signature(fetcher.json_file)
+        if current is not None and current != signature:
+            signature = current
+            try:
+                await reload_snapshot()
+            except Exception as e:
+                logger.error(f"Error reloading the snapshot: {e}")
+
+        if time.monotonic() >= next_attempt:
+            next_attempt = time.monotonic() + LEADER_RETRY_INTERVAL
+            if leader_lock.acquire():
+                logger.info(f"Worker {os.getpid()} took over refreshing profiles.")
+                if json_file_exists(fetcher.json_file):
+                    await reload_snapshot()
+                    await asyncio.to_thread(fetcher.cache.load)
+                await start_refresher()
+                return
+
+# Unloads the cohorts nobody has asked for in a while
+async def unload_idle_cohorts() -> None:
+    while True:
+        await asyncio.sleep(COHORT_CHECK_INTERVAL)
+        for name in await asyncio.to_thread(cohort_registry.evict_idle):
+            logger.info(f"Unloaded idle cohort {name}.")
+
+# Data fetching loop: refreshes whatever the scheduler says is due, then sleeps
+# until the next profile is due or an on-demand refresh comes in. An error, e.g. an
+# unreadable roster, is logged and the check is tried again after the longest sleep
+async def run_data_fetcher() -> None:
+    while True:
+        try:
+            await refresh_due_profiles()
+            next_due = refresh_scheduler.next_due()
+        except Exception as e:
+            logger.error(f"Error during the refresh cycle: {type(e).__name__}: {e}")
+            next_due = None  # Wait the longest before trying again
+        delay = SCHEDULER_MAX_SLEEP if next_due is None else min(SCHEDULER_MAX_SLEEP, max(1.0, next_due - time.time()))
+        try:
+            await asyncio.wait_for(refresh_requested.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        refresh_requested.clear()
+
+# Define routes. Per-cohort routes are served for the default cohort as listed and
+# for every cohort under /cohorts/{cohort}
+cohort_routes = [
     Route('/profiles', profiles),
+    Route('/profiles/stream', profiles_stream),
     Route('/profiles/id/{id}', get_profile),
+    Route('/profiles/id/{id}/history', profile_history),
+    Route('/history', cohort_history),
+    Route('/leaderboard', leaderboard),
+    Route('/badges', badges),
+    Route('/badges/{id:int}/missing', badge_missing),
+    Route('/analytics', analytics),
+    Route('/analytics/daily', analytics_daily),
+]
+routes = [
+    Route('/', homepage, methods=["GET", "POST"]),
+    *cohort_routes,
+    Route('/cohorts', cohorts),
+    *(Route('/cohorts/{cohort}' + route.path, route.endpoint) for route in cohort_routes),
     Route('/admin/dashboard', admin_dashboard, methods=["GET", "POST"]),
     Route('/admin/login', admin_login, methods=["GET", "POST"]),
+    Route('/admin/refresh/{id}', admin_refresh, methods=["GET", "POST"]),
+    Route('/admin/profile', admin_profile, methods=["GET", "POST"]),
+    Route('/admin/roster', admin_roster),
+    Route('/metrics', metrics),
 ]
 
 # Mount the static files directory
@@ -181,15 +677,64 @@ app.mount('/static', StaticFiles(directory='static'), name='static')
 # Middleware for sessions
 app.add_middleware(SessionMiddleware, secret_key="supersecretkey")
 
+# Request latency for /metrics, outermost so it covers the whole request
+app.add_middleware(MetricsMiddleware, histogram=REQUEST_DURATION,
+                   exclude=['/profiles/stream', '/cohorts/{cohort}/profiles/stream'])
+
+# Start refreshing profiles in this worker
+async def start_refresher() -> None:
+    fetcher = get_data_fetcher()
+    if json_file_exists(fetcher.json_file):
+        seed_scheduler(fetcher, os.path.getmtime(fetcher.json_file))
+    await export_schedule()
+    # Profiles without saved data are due straight away, so the first pass fetches them
+    asyncio.create_task(run_data_fetcher())  # Start the data fetching task
+    asyncio.create_task(run_commands())
+
 async def startup_event():
+    global profiles_published_at
     logger.info("Starting up...")
-    await run_get_data_script()  # Initial data fetch when the server starts
-    asyncio.create_task(run_data_fetcher())  # Start the data fetching task
+    # Open the query database (importing completed_queries.csv into a new one) off the event loop
+    await asyncio.to_thread(get_query_store)
+    # Serve the last saved data straight away; later sweeps publish into the store
+    if json_file_exists('profiles_data.json'):
+        fetcher = get_data_fetcher()
+        await asyncio.to_thread(fetcher.load_profiles)
+        profiles_published_at = os.path.getmtime('profiles_data.json')
+    # Other cohorts are loaded when first requested
+    if rosters_exist():
+        await asyncio.to_thread(cohort_registry.get, cohort_registry.default)
+
+    # One worker refreshes profiles; the rest serve the snapshots it saves
+    if leader_lock.acquire():
+        logger.info(f"Worker {os.getpid()} refreshes profiles.")
+        await start_refresher()
+    else:
+        logger.info(f"Worker {os.getpid()} follows the refresher's snapshots.")
+        asyncio.create_task(follow_refresher())
+    asyncio.create_task(flush_queries())
+    asyncio.create_task(unload_idle_cohorts())
     logger.info("Server started.")
 
-if __name__ == '__main__':
-    app.add_event_handler("startup", startup_event)
+async def shutdown_event():
+    if data_fetcher is not None:
+        data_fetcher.close()
+    if query_store is not None:
+        query_store.close()
+    if worker_state is not None:
+        worker_state.close()
+    leader_lock.release()
+
+# Registered here rather than under __main__ so `uvicorn server:app` runs them too
+app.add_event_handler("startup", startup_event)
+app.add_event_handler("shutdown", shutdown_event)
 
+if __name__ == '__main__':
     logger.info("Starting server...")
-    uvicorn.run(app, host='0.0.0.0', port=8000)
+    if WORKERS == 1:
+        uvicorn.run(app, host='0.0.0.0', port=8000)
+    else:
+        # Several processes need an import string. Each worker imports this module
+        # again as `server`, so the metrics are declared in metrics.py, not here
+        uvicorn.run("server:app", host='0.0.0.0', port=8000, workers=WORKERS)
     logger.info("Server stopped.")
@@ -0,0 +1,200 @@
+import json
+import mmap
+import os
+import tempfile
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+@contextmanager
+def atomic_file(path: str, mode: str = 'w', encoding: Optional[str] = 'utf-8'):
+    """
+    Opens a temporary file next to ``path`` and renames it over ``path`` once the
+    block finishes. Readers see either the old file or the complete new one,
+    never a partly written file. If the block raises, the temporary file is removed
+    and ``path`` is left untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding if 'b' not in mode else None) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def sidecar_paths(json_file: str) -> Tuple[str, str]:
+    """Returns the (NDJSON, offset index) sidecar paths that belong to ``json_file``."""
+    base = os.path.splitext(json_file)[0]
+    return base + ".ndjson", base + ".ndjson.idx"
+
+
+def file_identity(path: str) -> List[int]:
+    """
+    (size, mtime in ns, inode) of a file. Each atomic write publishes a new inode,
+    so this tells two versions of a file apart whatever the timestamp granularity.
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+class SnapshotWriter:
+    """
+    Writes profiles_data.json one record at a time and publishes it atomically.
+
+    Records are serialized as they are passed to ``write``, so the whole cohort is
+    never held as one big dict or string. Output is compact JSON. Optionally an
+    NDJSON sidecar (one ``{"key": ..., "profile": ...}`` line per record) is written
+    alongside, with an index of byte offsets that SnapshotReader uses to load single
+    records lazily from a memory map. The index is written last and records the
+    identity of the JSON file it was published with.
+
+        with SnapshotWriter("profiles_data.json", sidecar=True) as writer:
+            for key, profile in profiles.items():
+                writer.write(key, profile.to_dict())
+    """
+
+    def __init__(self, json_file: str, sidecar: bool = False):
+        """
+        :param json_file: Path of the snapshot to publish.
+        :param sidecar: Also write the NDJSON sidecar and its offset index.
+        """
+        self.json_file = json_file
+        self.sidecar = sidecar
+        self.ndjson_file, self.index_file = sidecar_paths(json_file)
+        self.count = 0
+        self._stack = ExitStack()
+        self._json = None
+        self._ndjson = None
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._offset = 0
+
+    def __enter__(self) -> "SnapshotWriter":
+        # Contexts unwind in reverse: the sidecar, then the main file, then the index,
+        # which can only match the new profiles_data.json once both are in place
+        with ExitStack() as stack:
+            if self.sidecar:
+                stack.push(self._write_index)
+            self._json = stack.enter_context(atomic_file(self.json_file))
+            self._json.write("{")
+            if self.sidecar:
+                self._ndjson = stack.enter_context(atomic_file(self.ndjson_file, 'wb'))
+            self._stack = stack.pop_all()
+        return self
+
+    def write(self, key: str, record: Dict[str, Any]) -> None:
+        """Appends one record to the snapshot."""
+        if self.count:
+            self._json.write(",")
+        self._json.write(json.dumps(key, ensure_ascii=False))
+        self._json.write(":")
+        self._json.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+
+        if self._ndjson is not None:
+            line = json.dumps({"key": key, "profile": record}, ensure_ascii=False,
+                              separators=(",", ":")).encode('utf-8') + b"\n"
+            self._ndjson.write(line)
+            self._offsets[key] = (self._offset, len(line))
+            self._offset += len(line)
+        self.count += 1
+
+    def _write_index(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            # A header line that is cheap to check, then the offsets
+            header = {"json": file_identity(self.json_file), "size": self._offset}
+            with atomic_file(self.index_file) as index:
+                index.write(json.dumps(header) + "\n")
+                json.dump(self._offsets, index, separators=(",", ":"))
+        return False
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self._json.write("}")
+        return self._stack.__exit__(exc_type, exc, tb)
+
+
+class SnapshotReader:
+    """
+    Lazy, memory-mapped access to the NDJSON sidecar written by SnapshotWriter.
+
+    Only the offset index is decoded up front; a record is decoded when it is
+    asked for. Raises ValueError if the sidecar, its index and the main file do not
+    all come from the same write (a writer is in the middle of publishing, or the
+    JSON file was written without a sidecar), in which case the caller should fall
+    back to the main JSON file.
+    """
+
+    def __init__(self, json_file: str):
+        """
+        :param json_file: Path of the main snapshot whose sidecar should be read.
+        """
+        self.ndjson_file, self.index_file = sidecar_paths(json_file)
+        with open(self.index_file, 'r', encoding='utf-8') as index:
+            header = self.read_header(index)
+            if header.get("json") != file_identity(json_file):
+                raise ValueError(f"{self.index_file} does not belong to the current {json_file}")
+            self.offsets: Dict[str, List[int]] = json.load(index)
+        self._file = open(self.ndjson_file, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size != header["size"]:
+            self._file.close()
+            raise ValueError(f"{self.ndjson_file} does not match its index")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    @staticmethod
+    def read_header(index) -> Dict[str, Any]:
+        header = json.loads(index.readline())
+        if not isinstance(header, dict):
+            raise ValueError("Invalid sidecar index")
+        return header
+
+    @staticmethod
+    def available(json_file: str) -> bool:
+        """True if ``json_file`` has a sidecar that was published with this version of it."""
+        ndjson_file, index_file = sidecar_paths(json_file)
+        try:
+            with open(index_file, 'r', encoding='utf-8') as index:
+                header = SnapshotReader.read_header(index)
+            return header.get("json") == file_identity(json_file) and os.path.exists(ndjson_file)
+        except (OSError, ValueError):
+            return False
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.offsets
+
+    def keys(self) -> Iterator[str]:
+        return iter(self.offsets)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Decodes and returns one record, or None if ``key`` is not in the snapshot."""
+        location = self.offsets.get(key)
+        if location is None or self._map is None:
+            return None
+        offset, length = location
+        return json.loads(self._map[offset:offset + length])["profile"]
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields (key, record) pairs one at a time in file order."""
+        for key in self.offsets:
+            yield key, self.get(key)
@@ -0,0 +1,84 @@
+import time
+from functools import cached_property
+from typing import Any, Dict, Optional, Tuple
+
+from badges import BadgeCatalog
+from leaderboard import Leaderboard
+from models import Profile
+from responses import EncodedBody
+
+
+class ProfileSnapshot:
+    """
+    One published version of the profile dataset, indexed by profile ID.
+
+    A snapshot is never modified after it is built; publishing new data creates a
+    new snapshot instead.
+    """
+
+    def __init__(self, profiles: Dict[str, Profile], published_at: Optional[float] = None,
+                 catalog: Optional[BadgeCatalog] = None):
+        """
+        :param profiles: Profile records keyed the same way as profiles_data.json.
+        :param published_at: Unix time the data was published, defaults to now.
+        :param catalog: The cohort's badge catalog the profiles were matched against.
+        """
+        # Shallow copy: the fetcher replaces records rather than mutating them
+        self.profiles: Dict[str, Profile] = dict(profiles)
+        self.published_at: float = time.time() if published_at is None else published_at
+        self.by_id: Dict[str, Tuple[str, Profile]] = {
+            profile.profile_id: (key, profile)
+            for key, profile in self.profiles.items()
+        }
+        self.catalog = catalog
+
+    @cached_property
+    def body(self) -> EncodedBody:
+        """The serialized and compressed /profiles payload for this snapshot."""
+        return EncodedBody({key: profile.to_dict() for key, profile in self.profiles.items()}, self.published_at)
+
+    @cached_property
+    def leaderboard(self) -> Leaderboard:
+        """Precomputed rankings for this snapshot."""
+        return Leaderboard(self.profiles, self.catalog.skill_count if self.catalog else 0)
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+
+class ProfileStore:
+    """
+    Process-wide holder for the current ProfileSnapshot.
+
+    Request handlers read ``store.snapshot`` once and use that object for the rest
+    of the request, so a concurrent ``publish`` (a single reference assignment)
+    can never hand them a half-updated dataset.
+    """
+
+    def __init__(self, catalog: Optional[BadgeCatalog] = None) -> None:
+        """
+        :param catalog: The cohort's badge catalog, passed on to every published snapshot.
+        """
+        self.catalog = catalog
+        self.snapshot: ProfileSnapshot = ProfileSnapshot({}, published_at=0.0)
+
+    def publish(self, profiles: Dict[str, Profile], published_at: Optional[float] = None) -> ProfileSnapshot:
+        """
+        Builds a snapshot from ``profiles`` and swaps it in as the current one.
+
+        The response body and leaderboard are built before the swap, so this is CPU-heavy
+        for a large cohort; call it from a worker thread when running inside the event loop.
+        """
+        snapshot = ProfileSnapshot(profiles, published_at, self.catalog)
+        snapshot.body  # pylint: disable=pointless-statement
+        snapshot.leaderboard  # pylint: disable=pointless-statement
+        self.snapshot = snapshot
+        return snapshot
+
+    def get_profile(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Returns ``{key: profile}`` in the profiles_data.json schema, or None if ``profile_id`` is unknown."""
+        entry = self.snapshot.by_id.get(profile_id)
+        if entry is None:
+            return None
+        key, profile = entry
+        return {key: profile.to_dict()}
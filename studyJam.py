@@ -2,6 +2,8 @@ import csv
 import json
 from typing import List, Dict
 
+from badges import infer_role
+
 class CSVProcessor:
     """
     A class to process a CSV file, read headings, filter unwanted headings, and save them in a JSON format.
@@ -46,7 +48,8 @@ class CSVProcessor:
                      "genai_badges": [
                          {
                              "id": <id>,
-                             "title": <heading_title>
+                             "title": <heading_title>,
+                             "role": "skill" | "game"
                          },
                          ...
                      ]
@@ -54,7 +57,7 @@ class CSVProcessor:
         """
         return {
             "genai_badges": [
-                {"id": idx + 1, "title": heading}
+                {"id": idx + 1, "title": heading, "role": infer_role(heading)}
                 for idx, heading in enumerate(headings)
             ]
         }